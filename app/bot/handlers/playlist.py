@@ -14,11 +14,14 @@ from app.services.user_service import user_service
 from app.schemas.playlist import PlaylistCreate, PlaylistUpdate, PlaylistTrackAdd
 from app.bot.keyboards.inline import (
     get_playlists_keyboard, get_playlist_actions_keyboard, 
-    get_add_to_playlist_keyboard, get_confirmation_keyboard,
+    get_add_to_playlist_keyboard_cached, get_confirmation_keyboard,
     get_back_to_menu_keyboard
 )
-from app.bot.keyboards.reply import get_cancel_keyboard
+from app.bot.keyboards.reply import BTN_CANCEL, get_cancel_keyboard
 from app.bot.keyboards.builders import DynamicKeyboardBuilder
+from app.bot.utils.callback_data import (
+    callback_prefixes, pack_track_callback, unpack_track_callback
+)
 
 playlist_router = Router()
 logger = get_logger(__name__)
@@ -346,7 +349,9 @@ async def show_add_to_playlist(callback: CallbackQuery, user, **kwargs):
             builder.row(
                 InlineKeyboardButton(
                     text="➕ Создать плейлист", 
-                    callback_data=f"create_playlist_with_track:{track_id}:{source}"
+                    callback_data=pack_track_callback(
+                        "create_playlist_with_track", track_id, source=source
+                    )
                 )
             )
             builder.row(
@@ -365,7 +370,7 @@ async def show_add_to_playlist(callback: CallbackQuery, user, **kwargs):
             return
         
         # Создаем клавиатуру выбора плейлиста
-        keyboard = get_add_to_playlist_keyboard(playlists, track_id, source)
+        keyboard = await get_add_to_playlist_keyboard_cached(playlists, track_id, source)
         
         select_text = (
             "📋 **Выберите плейлист**\n\n"
@@ -385,14 +390,12 @@ async def show_add_to_playlist(callback: CallbackQuery, user, **kwargs):
         await callback.answer("❌ Ошибка при загрузке плейлистов", show_alert=True)
 
 
-@playlist_router.callback_query(F.data.startswith("add_track_to_playlist:"))
+@playlist_router.callback_query(F.data.startswith(callback_prefixes("add_track_to_playlist")))
 async def add_track_to_playlist(callback: CallbackQuery, user, **kwargs):
     """Добавить трек в плейлист"""
     try:
-        parts = callback.data.split(":")
-        playlist_id = int(parts[1])
-        track_id = parts[2]
-        source = parts[3]
+        _, (playlist_id, track_id), source = unpack_track_callback(callback.data, 2)
+        playlist_id = int(playlist_id)
         
         # Получаем информацию о плейлисте
         playlist = await playlist_service.get_playlist_by_id(playlist_id, user.id)
@@ -557,7 +560,7 @@ def format_playlist_info(playlist, stats: dict, is_owner: bool) -> str:
 
 # Отмена состояний
 @playlist_router.callback_query(F.data.in_(["cancel", "cancel_creation"]))
-@playlist_router.message(F.text == "❌ Отмена")
+@playlist_router.message(F.text == BTN_CANCEL)
 async def cancel_action(event, state: FSMContext, **kwargs):
     """Отмена текущего действия"""
     try:
@@ -14,6 +14,12 @@ from app.bot.keyboards.inline import (
     get_track_actions_keyboard,
     get_search_filters_keyboard
 )
+from app.bot.utils.callback_data import (
+    SEARCH_PREFIX,
+    SEARCH_TOKEN_PREFIX,
+    build_search_callback_data,
+    resolve_search_query
+)
 from app.bot.utils.messages import Messages
 from app.bot.utils.formatters import format_track_info, format_search_results
 from app.services import (
@@ -21,6 +27,7 @@ from app.services import (
     get_analytics_service, get_music_aggregator
 )
 from app.services.search_service import SearchRequest, SearchStrategy
+from app.services.cache_service import user_cache
 from app.models.track import TrackSource
 from app.core.logging import get_logger, bot_logger
 from app.core.exceptions import (
@@ -53,16 +60,20 @@ async def handle_search_button(message: Message, state: FSMContext):
     await state.set_state(SearchStates.waiting_query)
 
 
-@router.callback_query(F.data.startswith("search:"))
+@router.callback_query(F.data.startswith((SEARCH_PREFIX, SEARCH_TOKEN_PREFIX)))
 async def callback_search(callback: CallbackQuery, state: FSMContext):
     """Обработка поиска из callback"""
     try:
-        query = callback.data.split(":", 1)[1]
+        query = resolve_search_query(callback.data)
+        if query is None:
+            await callback.answer("⏰ Запрос устарел. Повторите поиск.", show_alert=True)
+            return
+        
         await perform_search(callback.message, query, callback.from_user.id, state, is_callback=True)
         await callback.answer()
         
-    except Exception as e:
-        logger.error(f"Error in search callback: {e}")
+    except Exception:
+        logger.exception("Error in search callback")
         await callback.answer("❌ Ошибка при поиске.", show_alert=True)
 
 
@@ -86,8 +97,8 @@ async def handle_search_query(message: Message, state: FSMContext):
         
         await perform_search(message, query, message.from_user.id, state)
         
-    except Exception as e:
-        logger.error(f"Error handling search query: {e}")
+    except Exception:
+        logger.exception("Error handling search query")
         await message.answer("❌ Произошла ошибка при поиске.")
 
 
@@ -226,8 +237,8 @@ async def perform_search(
             parse_mode="HTML"
         )
         
-    except Exception as e:
-        logger.error(f"Error in perform_search: {e}")
+    except Exception:
+        logger.exception("Error in perform_search")
         await message.answer(
             "❌ <b>Ошибка поиска</b>\n\n"
             "Попробуйте другой запрос или повторите позже.",
@@ -266,8 +277,8 @@ async def callback_track_action(callback: CallbackQuery, state: FSMContext):
         else:
             await callback.answer("❌ Неизвестное действие.")
             
-    except Exception as e:
-        logger.error(f"Error in track action callback: {e}")
+    except Exception:
+        logger.exception("Error in track action callback")
         await callback.answer("❌ Ошибка при выполнении действия.")
 
 
@@ -370,6 +381,9 @@ async def handle_track_download(callback: CallbackQuery, track_data: dict, state
         # Удаляем сообщение о загрузке
         await download_msg.delete()
         
+        # Дневной счетчик изменился - кешированные лимиты middleware устарели
+        await user_cache.invalidate_user_bundle(user_id)
+        
         # Логируем скачивание
         await bot_logger.log_download(
             user_id=user_id,
@@ -392,8 +406,8 @@ async def handle_track_download(callback: CallbackQuery, track_data: dict, state
         # Возвращаемся к состоянию результатов поиска
         await state.set_state(SearchStates.showing_results)
         
-    except Exception as e:
-        logger.error(f"Error downloading track: {e}")
+    except Exception:
+        logger.exception("Error downloading track")
         
         try:
             await callback.message.edit_text(
@@ -432,8 +446,8 @@ async def handle_track_info(callback: CallbackQuery, track_data: dict):
         
         await callback.answer()
         
-    except Exception as e:
-        logger.error(f"Error showing track info: {e}")
+    except Exception:
+        logger.exception("Error showing track info")
         await callback.answer("❌ Ошибка при получении информации о треке.")
 
 
@@ -486,8 +500,8 @@ async def handle_add_to_playlist(callback: CallbackQuery, track_data: dict, stat
         
         await callback.answer()
         
-    except Exception as e:
-        logger.error(f"Error adding to playlist: {e}")
+    except Exception:
+        logger.exception("Error adding to playlist")
         await callback.answer("❌ Ошибка при добавлении в плейлист.")
 
 
@@ -548,8 +562,8 @@ async def callback_search_pagination(callback: CallbackQuery, state: FSMContext)
         
         await callback.answer(f"📄 Страница {page + 1} из {total_pages}")
         
-    except Exception as e:
-        logger.error(f"Error in search pagination: {e}")
+    except Exception:
+        logger.exception("Error in search pagination")
         await callback.answer("❌ Ошибка при переходе на страницу.")
 
 
@@ -600,8 +614,8 @@ async def callback_back_to_results(callback: CallbackQuery, state: FSMContext):
         await state.set_state(SearchStates.showing_results)
         await callback.answer()
         
-    except Exception as e:
-        logger.error(f"Error returning to results: {e}")
+    except Exception:
+        logger.exception("Error returning to results")
         await callback.answer("❌ Ошибка при возврате к результатам.")
 
 
@@ -692,8 +706,8 @@ async def callback_search_filter(callback: CallbackQuery, state: FSMContext):
             "current_filter": filter_type
         })
         
-    except Exception as e:
-        logger.error(f"Error in search filter: {e}")
+    except Exception:
+        logger.exception("Error in search filter")
         await callback.answer("❌ Ошибка при применении фильтра.")
 
 
@@ -707,7 +721,7 @@ def get_search_suggestions_keyboard(suggestions: List[str]):
         keyboard.append([
             InlineKeyboardButton(
                 text=f"🔍 {suggestion}",
-                callback_data=f"search:{suggestion}"
+                callback_data=build_search_callback_data(suggestion)
             )
         ])
     
@@ -735,7 +749,7 @@ async def handle_text_as_search(message: Message, state: FSMContext):
                 inline_keyboard=[
                     [InlineKeyboardButton(
                         text=f"🔍 Найти: {query[:30]}{'...' if len(query) > 30 else ''}",
-                        callback_data=f"search:{query}"
+                        callback_data=build_search_callback_data(query)
                     )],
                     [InlineKeyboardButton(text="🔙 В меню", callback_data="main_menu")]
                 ]
@@ -8,13 +8,18 @@ from aiogram.filters import CommandStart, Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from typing import Optional
+from weakref import WeakValueDictionary
+import asyncio
 
 from app.bot.keyboards.inline import (
     get_main_menu_keyboard,
     get_premium_keyboard,
     get_help_keyboard
 )
+from app.bot.keyboards.reply import BTN_MAIN_MENU
 from app.bot.utils.messages import Messages
+from app.bot.utils.decorators import safe_handler
+from app.bot.utils.callback_data import build_search_callback_data
 from app.services import get_user_service, get_analytics_service
 from app.core.logging import get_logger, bot_logger
 
@@ -22,6 +27,25 @@ router = Router()
 logger = get_logger(__name__)
 
 
+def _shorten_utf8(text: str, max_bytes: int = 48) -> str:
+    """Обрезать строку по длине в байтах UTF-8, не разрывая символы"""
+    return text.encode("utf-8")[:max_bytes].decode("utf-8", errors="ignore")
+
+
+# Блокировки по пользователю: параллельные /start одного пользователя
+# выполняются последовательно, разные пользователи - параллельно
+_user_locks: "WeakValueDictionary[int, asyncio.Lock]" = WeakValueDictionary()
+
+
+def _lock_for(user_id: int) -> asyncio.Lock:
+    """Получить блокировку пользователя"""
+    lock = _user_locks.get(user_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _user_locks[user_id] = lock
+    return lock
+
+
 class MainStates(StatesGroup):
     """Состояния главного меню"""
     main_menu = State()
@@ -29,9 +53,10 @@ class MainStates(StatesGroup):
 
 
 @router.message(CommandStart())
+@safe_handler("❌ Произошла ошибка при запуске бота. Попробуйте позже.", reply_markup=get_main_menu_keyboard)
 async def cmd_start(message: Message, state: FSMContext):
     """Обработчик команды /start"""
-    try:
+    async with _lock_for(message.from_user.id):
         user_service = get_user_service()
         analytics_service = get_analytics_service()
         
@@ -44,8 +69,8 @@ async def cmd_start(message: Message, state: FSMContext):
             language_code=message.from_user.language_code
         )
         
-        # Проверяем Premium статус
-        is_premium = await user_service.is_premium_user(message.from_user.id)
+        # Premium статус вычисляется по полям уже загруженного пользователя
+        is_premium = user.is_premium
         
         # Получаем статистику пользователя
         user_stats = await user_service.get_user_stats(message.from_user.id)
@@ -83,43 +108,33 @@ async def cmd_start(message: Message, state: FSMContext):
             chat_id=message.chat.id,
             command="/start"
         )
-        
-    except Exception as e:
-        logger.error(f"Error in start command: {e}")
-        await message.answer(
-            "❌ Произошла ошибка при запуске бота. Попробуйте позже.",
-            reply_markup=get_main_menu_keyboard(is_premium=False)
-        )
 
 
 @router.message(Command("help"))
+@safe_handler("❌ Ошибка при получении справки.")
 async def cmd_help(message: Message):
     """Обработчик команды /help"""
-    try:
-        help_text = Messages.get_help_message()
-        
-        await message.answer(
-            text=help_text,
-            reply_markup=get_help_keyboard(),
-            parse_mode="HTML"
-        )
-        
-        await bot_logger.log_update(
-            update_type="help_command",
-            user_id=message.from_user.id,
-            chat_id=message.chat.id,
-            command="/help"
-        )
-        
-    except Exception as e:
-        logger.error(f"Error in help command: {e}")
-        await message.answer("❌ Ошибка при получении справки.")
+    help_text = Messages.get_help_message()
+    
+    await message.answer(
+        text=help_text,
+        reply_markup=get_help_keyboard(),
+        parse_mode="HTML"
+    )
+    
+    await bot_logger.log_update(
+        update_type="help_command",
+        user_id=message.from_user.id,
+        chat_id=message.chat.id,
+        command="/help"
+    )
 
 
 @router.message(Command("menu"))
+@safe_handler("❌ Ошибка при показе меню.")
 async def cmd_menu(message: Message, state: FSMContext):
     """Обработчик команды /menu - показать главное меню"""
-    try:
+    async with _lock_for(message.from_user.id):
         user_service = get_user_service()
         
         # Проверяем Premium статус
@@ -134,145 +149,125 @@ async def cmd_menu(message: Message, state: FSMContext):
         )
         
         await state.set_state(MainStates.main_menu)
-        
-    except Exception as e:
-        logger.error(f"Error in menu command: {e}")
-        await message.answer("❌ Ошибка при показе меню.")
 
 
 @router.callback_query(F.data == "main_menu")
+@safe_handler("❌ Ошибка при показе меню.")
 async def callback_main_menu(callback: CallbackQuery, state: FSMContext):
     """Возврат в главное меню"""
-    try:
-        user_service = get_user_service()
-        
-        # Проверяем Premium статус
-        is_premium = await user_service.is_premium_user(callback.from_user.id)
-        
-        menu_text = Messages.get_main_menu_message(is_premium=is_premium)
-        
-        await callback.message.edit_text(
-            text=menu_text,
-            reply_markup=get_main_menu_keyboard(is_premium=is_premium),
-            parse_mode="HTML"
-        )
-        
-        await state.set_state(MainStates.main_menu)
-        await callback.answer()
-        
-    except Exception as e:
-        logger.error(f"Error in main menu callback: {e}")
-        await callback.answer("❌ Ошибка при показе меню.")
+    user_service = get_user_service()
+    
+    # Проверяем Premium статус
+    is_premium = await user_service.is_premium_user(callback.from_user.id)
+    
+    menu_text = Messages.get_main_menu_message(is_premium=is_premium)
+    
+    await callback.message.edit_text(
+        text=menu_text,
+        reply_markup=get_main_menu_keyboard(is_premium=is_premium),
+        parse_mode="HTML"
+    )
+    
+    await state.set_state(MainStates.main_menu)
+    await callback.answer()
 
 
 @router.callback_query(F.data == "about")
+@safe_handler("❌ Ошибка при получении информации.")
 async def callback_about(callback: CallbackQuery):
     """Информация о боте"""
-    try:
-        about_text = Messages.get_about_message()
-        
-        # Создаем клавиатуру с кнопкой "Назад"
-        from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-        
-        keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[
-                [InlineKeyboardButton(text="🔙 Назад в меню", callback_data="main_menu")]
-            ]
-        )
-        
-        await callback.message.edit_text(
-            text=about_text,
-            reply_markup=keyboard,
-            parse_mode="HTML"
-        )
-        
-        await callback.answer()
-        
-    except Exception as e:
-        logger.error(f"Error in about callback: {e}")
-        await callback.answer("❌ Ошибка при получении информации.")
+    about_text = Messages.get_about_message()
+    
+    # Создаем клавиатуру с кнопкой "Назад"
+    from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+    
+    keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="🔙 Назад в меню", callback_data="main_menu")]
+        ]
+    )
+    
+    await callback.message.edit_text(
+        text=about_text,
+        reply_markup=keyboard,
+        parse_mode="HTML"
+    )
+    
+    await callback.answer()
 
 
 @router.callback_query(F.data == "stats")
+@safe_handler("❌ Ошибка при получении статистики.")
 async def callback_stats(callback: CallbackQuery):
     """Статистика пользователя"""
-    try:
-        user_service = get_user_service()
-        
-        # Получаем статистику пользователя
-        user_stats = await user_service.get_user_stats(callback.from_user.id)
-        
-        # Проверяем лимиты
-        limits_info = await user_service.check_daily_limits(callback.from_user.id)
-        
-        stats_text = Messages.get_user_stats_message(
-            stats=user_stats,
-            limits=limits_info
-        )
-        
-        # Создаем клавиатуру
-        from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-        
-        keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[
-                [
-                    InlineKeyboardButton(text="📊 Детальная статистика", callback_data="detailed_stats"),
-                    InlineKeyboardButton(text="👑 Premium", callback_data="premium_info")
-                ],
-                [InlineKeyboardButton(text="🔙 Назад в меню", callback_data="main_menu")]
-            ]
-        )
-        
-        await callback.message.edit_text(
-            text=stats_text,
-            reply_markup=keyboard,
-            parse_mode="HTML"
-        )
-        
-        await callback.answer()
-        
-    except Exception as e:
-        logger.error(f"Error in stats callback: {e}")
-        await callback.answer("❌ Ошибка при получении статистики.")
+    user_service = get_user_service()
+    
+    # Получаем статистику пользователя
+    user_stats = await user_service.get_user_stats(callback.from_user.id)
+    
+    # Проверяем лимиты
+    limits_info = await user_service.check_daily_limits(callback.from_user.id)
+    
+    stats_text = Messages.get_user_stats_message(
+        stats=user_stats,
+        limits=limits_info
+    )
+    
+    # Создаем клавиатуру
+    from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+    
+    keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(text="📊 Детальная статистика", callback_data="detailed_stats"),
+                InlineKeyboardButton(text="👑 Premium", callback_data="premium_info")
+            ],
+            [InlineKeyboardButton(text="🔙 Назад в меню", callback_data="main_menu")]
+        ]
+    )
+    
+    await callback.message.edit_text(
+        text=stats_text,
+        reply_markup=keyboard,
+        parse_mode="HTML"
+    )
+    
+    await callback.answer()
 
 
 @router.callback_query(F.data == "support")
+@safe_handler("❌ Ошибка при получении информации о поддержке.")
 async def callback_support(callback: CallbackQuery):
     """Поддержка пользователей"""
-    try:
-        support_text = Messages.get_support_message()
-        
-        # Создаем клавиатуру с контактами
-        from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-        
-        keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[
-                [
-                    InlineKeyboardButton(text="💬 Чат поддержки", url="https://t.me/music_bot_support"),
-                    InlineKeyboardButton(text="📧 Email", url="mailto:support@musicbot.com")
-                ],
-                [
-                    InlineKeyboardButton(text="🐛 Сообщить об ошибке", callback_data="report_bug"),
-                    InlineKeyboardButton(text="💡 Предложить идею", callback_data="suggest_feature")
-                ],
-                [InlineKeyboardButton(text="🔙 Назад в меню", callback_data="main_menu")]
-            ]
-        )
-        
-        await callback.message.edit_text(
-            text=support_text,
-            reply_markup=keyboard,
-            parse_mode="HTML"
-        )
-        
-        await callback.answer()
-        
-    except Exception as e:
-        logger.error(f"Error in support callback: {e}")
-        await callback.answer("❌ Ошибка при получении информации о поддержке.")
+    support_text = Messages.get_support_message()
+    
+    # Создаем клавиатуру с контактами
+    from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+    
+    keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(text="💬 Чат поддержки", url="https://t.me/music_bot_support"),
+                InlineKeyboardButton(text="📧 Email", url="mailto:support@musicbot.com")
+            ],
+            [
+                InlineKeyboardButton(text="🐛 Сообщить об ошибке", callback_data="report_bug"),
+                InlineKeyboardButton(text="💡 Предложить идею", callback_data="suggest_feature")
+            ],
+            [InlineKeyboardButton(text="🔙 Назад в меню", callback_data="main_menu")]
+        ]
+    )
+    
+    await callback.message.edit_text(
+        text=support_text,
+        reply_markup=keyboard,
+        parse_mode="HTML"
+    )
+    
+    await callback.answer()
 
 
-@router.message(F.text.in_(["/start", "🏠 Главное меню", "🔙 В меню"]))
+@router.message(F.text.in_(["/start", BTN_MAIN_MENU, "🔙 В меню"]))
 async def text_main_menu(message: Message, state: FSMContext):
     """Обработка текстовых команд для главного меню"""
     await cmd_menu(message, state)
@@ -286,37 +281,35 @@ async def text_help(message: Message):
 
 # Обработчик неизвестных команд в главном меню
 @router.message(MainStates.main_menu)
+@safe_handler("❌ Произошла ошибка.")
 async def handle_main_menu_text(message: Message):
     """Обработка текста в главном меню"""
-    try:
+    text = message.text or ""
+    
+    if text[:1] == "/":
+        # Неизвестная команда
+        await message.answer(
+            "❓ Неизвестная команда. Используйте /help для получения списка команд.",
+            reply_markup=get_main_menu_keyboard(is_premium=False)
+        )
+    elif text:
         # Если это не команда, предлагаем поиск
-        if not message.text.startswith('/'):
-            search_text = Messages.get_search_suggestion(message.text)
-            
-            from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-            
-            keyboard = InlineKeyboardMarkup(
-                inline_keyboard=[
-                    [InlineKeyboardButton(
-                        text=f"🔍 Найти: {message.text[:30]}...", 
-                        callback_data=f"search:{message.text}"
-                    )],
-                    [InlineKeyboardButton(text="🔙 В меню", callback_data="main_menu")]
-                ]
-            )
-            
-            await message.answer(
-                text=search_text,
-                reply_markup=keyboard,
-                parse_mode="HTML"
-            )
-        else:
-            # Неизвестная команда
-            await message.answer(
-                "❓ Неизвестная команда. Используйте /help для получения списка команд.",
-                reply_markup=get_main_menu_keyboard(is_premium=False)
-            )
-            
-    except Exception as e:
-        logger.error(f"Error handling main menu text: {e}")
-        await message.answer("❌ Произошла ошибка.")
\ No newline at end of file
+        search_text = Messages.get_search_suggestion(text)
+        
+        from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+        
+        keyboard = InlineKeyboardMarkup(
+            inline_keyboard=[
+                [InlineKeyboardButton(
+                    text=f"🔍 Найти: {_shorten_utf8(text)}...", 
+                    callback_data=build_search_callback_data(text)
+                )],
+                [InlineKeyboardButton(text="🔙 В меню", callback_data="main_menu")]
+            ]
+        )
+        
+        await message.answer(
+            text=search_text,
+            reply_markup=keyboard,
+            parse_mode="HTML"
+        )
@@ -3,6 +3,7 @@
 """
 
 from app.bot.keyboards.inline import (
+    MARKUPS,
     get_main_menu_keyboard,
     get_search_results_keyboard,
     get_track_actions_keyboard,
@@ -17,6 +18,7 @@ from app.bot.keyboards.inline import (
     get_quality_settings_keyboard,
     get_confirmation_keyboard,
     get_add_to_playlist_keyboard,
+    get_add_to_playlist_keyboard_cached,
     get_trending_categories_keyboard,
     get_genres_keyboard,
     get_inline_search_keyboard,
@@ -31,6 +33,7 @@ from app.bot.keyboards.inline import (
 )
 
 from app.bot.keyboards.reply import (
+    MAIN_MENU_TEXTS,
     get_main_reply_keyboard,
     get_search_keyboard,
     get_playlist_management_keyboard,
@@ -60,6 +63,7 @@ from app.bot.keyboards.builders import (
 
 __all__ = [
     # Inline keyboards
+    "MARKUPS",
     "get_main_menu_keyboard",
     "get_search_results_keyboard", 
     "get_track_actions_keyboard",
@@ -74,6 +78,7 @@ __all__ = [
     "get_quality_settings_keyboard",
     "get_confirmation_keyboard",
     "get_add_to_playlist_keyboard",
+    "get_add_to_playlist_keyboard_cached",
     "get_trending_categories_keyboard",
     "get_genres_keyboard",
     "get_inline_search_keyboard",
@@ -87,6 +92,7 @@ __all__ = [
     "create_paginated_keyboard",
     
     # Reply keyboards
+    "MAIN_MENU_TEXTS",
     "get_main_reply_keyboard",
     "get_search_keyboard",
     "get_playlist_management_keyboard",
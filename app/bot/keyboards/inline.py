@@ -1,39 +1,203 @@
 """
 Inline клавиатуры для музыкального бота
 """
-from typing import List, Optional
+import functools
+import hashlib
+from functools import lru_cache
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from app.bot.utils.callback_data import pack_track_callback
 from app.services.music.base import SearchResult
+from app.services.cache_service import cache_service
 from app.schemas.playlist import PlaylistResponse
 
 
-def get_main_menu_keyboard() -> InlineKeyboardMarkup:
+# Общие кнопки, повторяющиеся в разных клавиатурах
+BTN_HOME = InlineKeyboardButton(text="🏠 Главная", callback_data="main_menu")
+BTN_BACK_MAIN = InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")
+BTN_BACK_PREMIUM = InlineKeyboardButton(text="⬅️ Назад", callback_data="premium")
+BTN_CANCEL = InlineKeyboardButton(text="❌ Отмена", callback_data="cancel")
+BTN_NEW_SEARCH = InlineKeyboardButton(text="🔍 Новый поиск", callback_data="new_search")
+
+# Максимум плейлистов в клавиатуре добавления трека
+ADD_TO_PLAYLIST_LIMIT = 8
+
+# Иконки качества для кнопок результатов поиска
+_QUALITY_ICONS = {"ultra": "💎", "high": "🔹", "medium": "🔸", "low": "🔻"}
+
+
+def _truncate(text: str, limit: int) -> str:
+    """Обрезать текст кнопки до limit символов с многоточием"""
+    return f"{text[:limit]}..." if len(text) > limit else text
+
+
+# Варианты качества аудио и готовые кнопки для них
+_QUALITIES = (
+    ("🔻 128kbps", "128kbps"),
+    ("🔸 192kbps", "192kbps"),
+    ("🔹 256kbps", "256kbps"),
+    ("💎 320kbps", "320kbps")
+)
+_QUALITY_BUTTONS = {
+    quality: InlineKeyboardButton(text=text, callback_data=f"set_quality:{quality}")
+    for text, quality in _QUALITIES
+}
+_QUALITY_BUTTONS_CHECKED = {
+    quality: InlineKeyboardButton(text=f"✅ {text}", callback_data=f"set_quality:{quality}")
+    for text, quality in _QUALITIES
+}
+
+# Жанры для клавиатуры выбора
+_GENRES = (
+    ("🎸 Rock", "rock"),
+    ("🎤 Pop", "pop"),
+    ("🎵 Hip-Hop", "hip-hop"),
+    ("🎹 Electronic", "electronic"),
+    ("🎺 Jazz", "jazz"),
+    ("🎻 Classical", "classical"),
+    ("🪕 Folk", "folk"),
+    ("🎷 Blues", "blues")
+)
+
+
+class _MarkupRegistry:
+    """Клавиатуры без параметров, собранные один раз при импорте модуля"""
+    
+    __slots__ = (
+        "main_menu",
+        "premium",
+        "premium_offer",
+        "renew_subscription",
+        "payment_method",
+        "crypto_currencies",
+        "settings",
+        "trending_categories",
+        "genres",
+        "help",
+        "admin",
+        "broadcast",
+        "back_to_menu",
+        "cancel",
+    )
+
+
+MARKUPS = _MarkupRegistry()
+
+
+def _static_markup(
+    build: Callable[[], InlineKeyboardMarkup]
+) -> Callable[[], InlineKeyboardMarkup]:
+    """Собрать клавиатуру при импорте и возвращать один и тот же экземпляр"""
+    markup = build()
+    name = build.__name__.lstrip("_").removeprefix("get_").removesuffix("_keyboard")
+    setattr(MARKUPS, name, markup)
+
+    @functools.wraps(build)
+    def getter() -> InlineKeyboardMarkup:
+        return markup
+
+    return getter
+
+
+@_static_markup
+def _main_menu_keyboard() -> InlineKeyboardMarkup:
     """Главное меню бота"""
-    builder = InlineKeyboardBuilder()
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="🔍 Поиск музыки", callback_data="search_music"),
+            InlineKeyboardButton(text="🔥 Популярное", callback_data="trending")
+        ],
+        [
+            InlineKeyboardButton(text="📋 Мои плейлисты", callback_data="my_playlists"),
+            InlineKeyboardButton(text="❤️ Избранное", callback_data="favorites")
+        ],
+        [
+            InlineKeyboardButton(text="🎯 Рекомендации", callback_data="recommendations"),
+            InlineKeyboardButton(text="📊 Статистика", callback_data="stats")
+        ],
+        [
+            InlineKeyboardButton(text="👤 Профиль", callback_data="profile"),
+            InlineKeyboardButton(text="⚙️ Настройки", callback_data="settings")
+        ],
+        [
+            InlineKeyboardButton(text="💎 Premium", callback_data="premium")
+        ]
+    ])
+
+
+def get_main_menu_keyboard(is_premium: bool = False) -> InlineKeyboardMarkup:
+    """Главное меню бота
+
+    Раскладка одинакова для всех пользователей, is_premium принимается
+    для совместимости с вызовами из обработчиков
+    """
+    return _main_menu_keyboard()
+
+
+# Описание кнопки до создания pydantic модели: (text, callback_data)
+ButtonSpec = Tuple[str, str]
+
+
+def _button_rows(specs: Iterable[Iterable[ButtonSpec]]) -> List[List[InlineKeyboardButton]]:
+    """Превратить ряды описаний (text, callback_data) в ряды кнопок"""
+    return [
+        [InlineKeyboardButton(text=text, callback_data=callback_data) for text, callback_data in row]
+        for row in specs
+    ]
+
+
+@lru_cache(maxsize=4096)
+def _nav_row(
+    page: int,
+    total_pages: int,
+    callback_prefix: str,
+    current_callback: str = "current_page",
+    prev_text: str = "⬅️",
+    next_text: str = "➡️",
+    page_prefix: str = ""
+) -> Tuple[InlineKeyboardButton, ...]:
+    """Ряд навигации: назад, номер страницы, вперёд
+
+    Подписи кнопок - параметры, чтобы каждая клавиатура сохраняла свой текст
+    """
+    buttons = []
     
-    builder.row(
-        InlineKeyboardButton(text="🔍 Поиск музыки", callback_data="search_music"),
-        InlineKeyboardButton(text="🔥 Популярное", callback_data="trending")
-    )
-    builder.row(
-        InlineKeyboardButton(text="📋 Мои плейлисты", callback_data="my_playlists"),
-        InlineKeyboardButton(text="❤️ Избранное", callback_data="favorites")
-    )
-    builder.row(
-        InlineKeyboardButton(text="🎯 Рекомендации", callback_data="recommendations"),
-        InlineKeyboardButton(text="📊 Статистика", callback_data="stats")
-    )
-    builder.row(
-        InlineKeyboardButton(text="👤 Профиль", callback_data="profile"),
-        InlineKeyboardButton(text="⚙️ Настройки", callback_data="settings")
-    )
-    builder.row(
-        InlineKeyboardButton(text="💎 Premium", callback_data="premium")
+    if page > 0:
+        buttons.append(
+            InlineKeyboardButton(text=prev_text, callback_data=f"{callback_prefix}:{page-1}")
+        )
+    
+    buttons.append(
+        InlineKeyboardButton(
+            text=f"{page_prefix}{page + 1}/{total_pages}",
+            callback_data=current_callback
+        )
     )
     
-    return builder.as_markup()
+    if page < total_pages - 1:
+        buttons.append(
+            InlineKeyboardButton(text=next_text, callback_data=f"{callback_prefix}:{page+1}")
+        )
+    
+    return tuple(buttons)
+
+
+def _search_result_spec(result: SearchResult) -> ButtonSpec:
+    """Описание кнопки трека в результатах поиска"""
+    # Ограничиваем длину названия
+    title = _truncate(result.title, 30)
+    artist = _truncate(result.artist, 20)
+    
+    # Иконка качества
+    quality_icon = _QUALITY_ICONS.get(result.audio_quality.value.lower(), "🎵")
+    
+    return (
+        f"{quality_icon} {artist} - {title}",
+        f"track:{result.external_id}:{result.source.value}"
+    )
 
 
 def get_search_results_keyboard(
@@ -42,71 +206,29 @@ def get_search_results_keyboard(
     per_page: int = 5
 ) -> InlineKeyboardMarkup:
     """Клавиатура с результатами поиска"""
-    builder = InlineKeyboardBuilder()
-    
+    total = len(results)
     start_idx = page * per_page
     end_idx = start_idx + per_page
-    page_results = results[start_idx:end_idx]
-    
-    for i, result in enumerate(page_results):
-        # Ограничиваем длину названия
-        title = result.title[:30] + "..." if len(result.title) > 30 else result.title
-        artist = result.artist[:20] + "..." if len(result.artist) > 20 else result.artist
-        
-        # Иконка качества
-        quality_icon = {
-            "ultra": "💎",
-            "high": "🔹", 
-            "medium": "🔸",
-            "low": "🔻"
-        }.get(result.audio_quality.value.lower(), "🎵")
-        
-        # Иконка источника
-        source_icon = {
-            "vk_audio": "🎵",
-            "youtube": "📺",
-            "spotify": "🎶"
-        }.get(result.source.value.lower(), "🎧")
-        
-        button_text = f"{quality_icon} {artist} - {title}"
-        callback_data = f"track:{result.external_id}:{result.source.value}"
-        
-        builder.row(
-            InlineKeyboardButton(text=button_text, callback_data=callback_data)
-        )
-    
-    # Навигация
-    nav_buttons = []
     
-    if page > 0:
-        nav_buttons.append(
-            InlineKeyboardButton(text="⬅️ Назад", callback_data=f"search_page:{page-1}")
-        )
-    
-    # Показываем текущую страницу
-    total_pages = (len(results) - 1) // per_page + 1
-    nav_buttons.append(
-        InlineKeyboardButton(
-            text=f"📄 {page + 1}/{total_pages}", 
-            callback_data="current_page"
-        )
+    rows = _button_rows(
+        [_search_result_spec(result)]
+        for result in islice(results, start_idx, end_idx)
     )
     
-    if end_idx < len(results):
-        nav_buttons.append(
-            InlineKeyboardButton(text="Далее ➡️", callback_data=f"search_page:{page+1}")
-        )
-    
-    if nav_buttons:
-        builder.row(*nav_buttons)
+    # Навигация
+    total_pages = -(-total // per_page)
+    rows.append(list(_nav_row(
+        page, total_pages, "search_page",
+        prev_text="⬅️ Назад", next_text="Далее ➡️", page_prefix="📄 "
+    )))
     
     # Дополнительные опции
-    builder.row(
-        InlineKeyboardButton(text="🔍 Новый поиск", callback_data="new_search"),
-        InlineKeyboardButton(text="🏠 Главная", callback_data="main_menu")
-    )
+    rows.append([
+        BTN_NEW_SEARCH,
+        BTN_HOME
+    ])
     
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
 def get_track_actions_keyboard(
@@ -116,10 +238,10 @@ def get_track_actions_keyboard(
     in_favorites: bool = False
 ) -> InlineKeyboardMarkup:
     """Клавиатура с действиями для трека"""
-    builder = InlineKeyboardBuilder()
+    rows: List[List[InlineKeyboardButton]] = []
     
     # Основные действия
-    builder.row(
+    rows.append([
         InlineKeyboardButton(
             text="⬇️ Скачать", 
             callback_data=f"download:{track_id}:{source}"
@@ -128,10 +250,10 @@ def get_track_actions_keyboard(
             text="💖" if not in_favorites else "💔",
             callback_data=f"toggle_favorite:{track_id}:{source}"
         )
-    )
+    ])
     
     # Добавить в плейлист
-    builder.row(
+    rows.append([
         InlineKeyboardButton(
             text="➕ В плейлист", 
             callback_data=f"add_to_playlist:{track_id}:{source}"
@@ -140,10 +262,10 @@ def get_track_actions_keyboard(
             text="📤 Поделиться", 
             callback_data=f"share:{track_id}:{source}"
         )
-    )
+    ])
     
     # Похожие треки
-    builder.row(
+    rows.append([
         InlineKeyboardButton(
             text="🎵 Похожие", 
             callback_data=f"similar:{track_id}:{source}"
@@ -152,24 +274,42 @@ def get_track_actions_keyboard(
             text="👤 Исполнитель", 
             callback_data=f"artist:{track_id}:{source}"
         )
-    )
+    ])
     
     # Premium опции
     if is_premium:
-        builder.row(
+        rows.append([
             InlineKeyboardButton(
                 text="💎 320kbps", 
                 callback_data=f"download_320kbps:{track_id}:{source}"
             )
-        )
+        ])
     
     # Навигация
-    builder.row(
+    rows.append([
         InlineKeyboardButton(text="⬅️ К результатам", callback_data="back_to_results"),
-        InlineKeyboardButton(text="🏠 Главная", callback_data="main_menu")
-    )
+        BTN_HOME
+    ])
+    
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def _playlists_rows(playlists: Iterable[PlaylistResponse]) -> Iterator[List[ButtonSpec]]:
+    """Ряды описаний кнопок плейлистов, по два в ряд, по мере обхода"""
+    row: List[ButtonSpec] = []
+    
+    for playlist in playlists:
+        row.append((
+            f"📋 {_truncate(playlist.title, 25)} ({playlist.tracks_count})",
+            f"playlist:{playlist.id}"
+        ))
+        
+        if len(row) == 2:
+            yield row
+            row = []
     
-    return builder.as_markup()
+    if row:
+        yield row
 
 
 def get_playlists_keyboard(
@@ -178,78 +318,27 @@ def get_playlists_keyboard(
     per_page: int = 8
 ) -> InlineKeyboardMarkup:
     """Клавиатура со списком плейлистов"""
-    builder = InlineKeyboardBuilder()
-    
+    total = len(playlists)
     start_idx = page * per_page
     end_idx = start_idx + per_page
-    page_playlists = playlists[start_idx:end_idx]
     
-    # Плейлисты по два в ряд
-    for i in range(0, len(page_playlists), 2):
-        row_buttons = []
-        
-        # Первый плейлист в ряду
-        playlist = page_playlists[i]
-        title = playlist.title[:25] + "..." if len(playlist.title) > 25 else playlist.title
-        button_text = f"📋 {title} ({playlist.tracks_count})"
-        
-        row_buttons.append(
-            InlineKeyboardButton(
-                text=button_text,
-                callback_data=f"playlist:{playlist.id}"
-            )
-        )
-        
-        # Второй плейлист в ряду (если есть)
-        if i + 1 < len(page_playlists):
-            playlist2 = page_playlists[i + 1]
-            title2 = playlist2.title[:25] + "..." if len(playlist2.title) > 25 else playlist2.title
-            button_text2 = f"📋 {title2} ({playlist2.tracks_count})"
-            
-            row_buttons.append(
-                InlineKeyboardButton(
-                    text=button_text2,
-                    callback_data=f"playlist:{playlist2.id}"
-                )
-            )
-        
-        builder.row(*row_buttons)
+    rows = _button_rows(_playlists_rows(islice(playlists, start_idx, end_idx)))
     
     # Навигация для плейлистов
-    nav_buttons = []
-    
-    if page > 0:
-        nav_buttons.append(
-            InlineKeyboardButton(text="⬅️", callback_data=f"playlists_page:{page-1}")
-        )
-    
-    total_pages = (len(playlists) - 1) // per_page + 1 if playlists else 1
-    nav_buttons.append(
-        InlineKeyboardButton(
-            text=f"{page + 1}/{total_pages}", 
-            callback_data="current_playlists_page"
-        )
-    )
-    
-    if end_idx < len(playlists):
-        nav_buttons.append(
-            InlineKeyboardButton(text="➡️", callback_data=f"playlists_page:{page+1}")
-        )
-    
-    if nav_buttons:
-        builder.row(*nav_buttons)
+    total_pages = -(-total // per_page) or 1
+    rows.append(list(_nav_row(page, total_pages, "playlists_page", "current_playlists_page")))
     
     # Дополнительные действия
-    builder.row(
+    rows.append([
         InlineKeyboardButton(text="➕ Новый плейлист", callback_data="create_playlist"),
         InlineKeyboardButton(text="🔍 Поиск плейлистов", callback_data="search_playlists")
-    )
+    ])
     
-    builder.row(
-        InlineKeyboardButton(text="🏠 Главная", callback_data="main_menu")
-    )
+    rows.append([
+        BTN_HOME
+    ])
     
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
 def get_playlist_actions_keyboard(
@@ -258,11 +347,11 @@ def get_playlist_actions_keyboard(
     is_empty: bool = False
 ) -> InlineKeyboardMarkup:
     """Клавиатура с действиями для плейлиста"""
-    builder = InlineKeyboardBuilder()
+    rows: List[List[InlineKeyboardButton]] = []
     
     if not is_empty:
         # Основные действия с плейлистом
-        builder.row(
+        rows.append([
             InlineKeyboardButton(
                 text="▶️ Играть все", 
                 callback_data=f"play_playlist:{playlist_id}"
@@ -271,9 +360,9 @@ def get_playlist_actions_keyboard(
                 text="🔀 Перемешать", 
                 callback_data=f"shuffle_playlist:{playlist_id}"
             )
-        )
+        ])
         
-        builder.row(
+        rows.append([
             InlineKeyboardButton(
                 text="📋 Треки", 
                 callback_data=f"playlist_tracks:{playlist_id}"
@@ -282,11 +371,11 @@ def get_playlist_actions_keyboard(
                 text="📊 Статистика", 
                 callback_data=f"playlist_stats:{playlist_id}"
             )
-        )
+        ])
     
     # Действия владельца
     if is_owner:
-        builder.row(
+        rows.append([
             InlineKeyboardButton(
                 text="✏️ Редактировать", 
                 callback_data=f"edit_playlist:{playlist_id}"
@@ -295,10 +384,10 @@ def get_playlist_actions_keyboard(
                 text="👥 Доступ", 
                 callback_data=f"playlist_sharing:{playlist_id}"
             )
-        )
+        ])
         
         if not is_empty:
-            builder.row(
+            rows.append([
                 InlineKeyboardButton(
                     text="📤 Экспорт", 
                     callback_data=f"export_playlist:{playlist_id}"
@@ -307,10 +396,10 @@ def get_playlist_actions_keyboard(
                     text="🗑️ Удалить", 
                     callback_data=f"delete_playlist:{playlist_id}"
                 )
-            )
+            ])
     else:
         # Действия для чужих плейлистов
-        builder.row(
+        rows.append([
             InlineKeyboardButton(
                 text="📋 Копировать", 
                 callback_data=f"copy_playlist:{playlist_id}"
@@ -319,227 +408,200 @@ def get_playlist_actions_keyboard(
                 text="📤 Поделиться", 
                 callback_data=f"share_playlist:{playlist_id}"
             )
-        )
+        ])
     
     # Навигация
-    builder.row(
+    rows.append([
         InlineKeyboardButton(text="⬅️ К плейлистам", callback_data="my_playlists"),
-        InlineKeyboardButton(text="🏠 Главная", callback_data="main_menu")
-    )
+        BTN_HOME
+    ])
     
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@_static_markup
 def get_premium_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для Premium подписки"""
-    builder = InlineKeyboardBuilder()
-    
-    # Планы подписки
-    builder.row(
-        InlineKeyboardButton(
-            text="⭐ 1 месяц - 150 Stars", 
-            callback_data="premium_plan:1month"
-        )
-    )
-    builder.row(
-        InlineKeyboardButton(
-            text="⭐ 3 месяца - 400 Stars (-12%)", 
-            callback_data="premium_plan:3months"
-        )
-    )
-    builder.row(
-        InlineKeyboardButton(
-            text="⭐ 1 год - 1400 Stars (-23%)", 
-            callback_data="premium_plan:1year"
-        )
-    )
-    
-    # Альтернативные способы оплаты
-    builder.row(
-        InlineKeyboardButton(
-            text="💎 Оплата криптой", 
-            callback_data="crypto_payment"
-        )
-    )
-    
-    # Информация
-    builder.row(
-        InlineKeyboardButton(
-            text="ℹ️ Что даёт Premium", 
-            callback_data="premium_benefits"
-        ),
-        InlineKeyboardButton(
-            text="🎁 Промокод", 
-            callback_data="promo_code"
-        )
-    )
-    
-    builder.row(
-        InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")
-    )
-    
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[
+        # Планы подписки
+        [
+            InlineKeyboardButton(
+                text="⭐ 1 месяц - 150 Stars", 
+                callback_data="premium_plan:1month"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                text="⭐ 3 месяца - 400 Stars (-12%)", 
+                callback_data="premium_plan:3months"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                text="⭐ 1 год - 1400 Stars (-23%)", 
+                callback_data="premium_plan:1year"
+            )
+        ],
+        # Альтернативные способы оплаты
+        [
+            InlineKeyboardButton(
+                text="💎 Оплата криптой", 
+                callback_data="crypto_payment"
+            )
+        ],
+        # Информация
+        [
+            InlineKeyboardButton(
+                text="ℹ️ Что даёт Premium", 
+                callback_data="premium_benefits"
+            ),
+            InlineKeyboardButton(
+                text="🎁 Промокод", 
+                callback_data="promo_code"
+            )
+        ],
+        [
+            BTN_BACK_MAIN
+        ]
+    ])
 
 
+@_static_markup
 def get_premium_offer_keyboard() -> InlineKeyboardMarkup:
     """Компактная клавиатура с предложением Premium"""
-    builder = InlineKeyboardBuilder()
-    
-    builder.row(
-        InlineKeyboardButton(
-            text="💎 Получить Premium", 
-            callback_data="premium"
-        )
-    )
-    
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(
+                text="💎 Получить Premium", 
+                callback_data="premium"
+            )
+        ]
+    ])
 
 
+@_static_markup
 def get_renew_subscription_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для продления подписки"""
-    builder = InlineKeyboardBuilder()
-    
-    builder.row(
-        InlineKeyboardButton(
-            text="🔄 Продлить подписку", 
-            callback_data="premium"
-        )
-    )
-    
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(
+                text="🔄 Продлить подписку", 
+                callback_data="premium"
+            )
+        ]
+    ])
 
 
+@_static_markup
 def get_payment_method_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура выбора способа оплаты"""
-    builder = InlineKeyboardBuilder()
-    
-    builder.row(
-        InlineKeyboardButton(
-            text="⭐ Telegram Stars", 
-            callback_data="payment_method:stars"
-        )
-    )
-    builder.row(
-        InlineKeyboardButton(
-            text="💎 CryptoBot (TON, BTC, USDT)", 
-            callback_data="payment_method:crypto"
-        )
-    )
-    
-    builder.row(
-        InlineKeyboardButton(text="⬅️ Назад", callback_data="premium")
-    )
-    
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(
+                text="⭐ Telegram Stars", 
+                callback_data="payment_method:stars"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                text="💎 CryptoBot (TON, BTC, USDT)", 
+                callback_data="payment_method:crypto"
+            )
+        ],
+        [
+            BTN_BACK_PREMIUM
+        ]
+    ])
 
 
+@_static_markup
 def get_crypto_currencies_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура выбора криптовалюты"""
-    builder = InlineKeyboardBuilder()
-    
-    builder.row(
-        InlineKeyboardButton(text="💎 TON", callback_data="crypto_currency:TON"),
-        InlineKeyboardButton(text="₿ BTC", callback_data="crypto_currency:BTC")
-    )
-    builder.row(
-        InlineKeyboardButton(text="💵 USDT", callback_data="crypto_currency:USDT"),
-        InlineKeyboardButton(text="⚡ USDC", callback_data="crypto_currency:USDC")
-    )
-    
-    builder.row(
-        InlineKeyboardButton(text="⬅️ Назад", callback_data="premium")
-    )
-    
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="💎 TON", callback_data="crypto_currency:TON"),
+            InlineKeyboardButton(text="₿ BTC", callback_data="crypto_currency:BTC")
+        ],
+        [
+            InlineKeyboardButton(text="💵 USDT", callback_data="crypto_currency:USDT"),
+            InlineKeyboardButton(text="⚡ USDC", callback_data="crypto_currency:USDC")
+        ],
+        [
+            BTN_BACK_PREMIUM
+        ]
+    ])
 
 
+@_static_markup
 def get_settings_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура настроек"""
-    builder = InlineKeyboardBuilder()
-    
-    builder.row(
-        InlineKeyboardButton(
-            text="🎵 Качество аудио", 
-            callback_data="settings:quality"
-        ),
-        InlineKeyboardButton(
-            text="🔔 Уведомления", 
-            callback_data="settings:notifications"
-        )
-    )
-    builder.row(
-        InlineKeyboardButton(
-            text="🌐 Язык", 
-            callback_data="settings:language"
-        ),
-        InlineKeyboardButton(
-            text="🎯 Рекомендации", 
-            callback_data="settings:recommendations"
-        )
-    )
-    builder.row(
-        InlineKeyboardButton(
-            text="🗄️ Экспорт данных", 
-            callback_data="settings:export_data"
-        ),
-        InlineKeyboardButton(
-            text="🗑️ Удалить аккаунт", 
-            callback_data="settings:delete_account"
-        )
-    )
-    
-    builder.row(
-        InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")
-    )
-    
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(
+                text="🎵 Качество аудио", 
+                callback_data="settings:quality"
+            ),
+            InlineKeyboardButton(
+                text="🔔 Уведомления", 
+                callback_data="settings:notifications"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                text="🌐 Язык", 
+                callback_data="settings:language"
+            ),
+            InlineKeyboardButton(
+                text="🎯 Рекомендации", 
+                callback_data="settings:recommendations"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                text="🗄️ Экспорт данных", 
+                callback_data="settings:export_data"
+            ),
+            InlineKeyboardButton(
+                text="🗑️ Удалить аккаунт", 
+                callback_data="settings:delete_account"
+            )
+        ],
+        [
+            BTN_BACK_MAIN
+        ]
+    ])
 
 
+@lru_cache(maxsize=8)
 def get_quality_settings_keyboard(current_quality: str = "192kbps") -> InlineKeyboardMarkup:
     """Клавиатура настройки качества аудио"""
-    builder = InlineKeyboardBuilder()
-    
-    qualities = [
-        ("🔻 128kbps", "128kbps"),
-        ("🔸 192kbps", "192kbps"), 
-        ("🔹 256kbps", "256kbps"),
-        ("💎 320kbps", "320kbps")
+    rows = [
+        [_QUALITY_BUTTONS_CHECKED[quality] if quality == current_quality else _QUALITY_BUTTONS[quality]]
+        for _, quality in _QUALITIES
     ]
     
-    for text, quality in qualities:
-        if quality == current_quality:
-            text = f"✅ {text}"
-        
-        builder.row(
-            InlineKeyboardButton(
-                text=text,
-                callback_data=f"set_quality:{quality}"
-            )
-        )
-    
-    builder.row(
+    rows.append([
         InlineKeyboardButton(text="⬅️ Назад", callback_data="settings")
-    )
+    ])
     
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@lru_cache(maxsize=512)
 def get_confirmation_keyboard(action: str, item_id: str = "") -> InlineKeyboardMarkup:
     """Клавиатура подтверждения действия"""
-    builder = InlineKeyboardBuilder()
-    
-    builder.row(
-        InlineKeyboardButton(
-            text="✅ Да",
-            callback_data=f"confirm:{action}:{item_id}"
-        ),
-        InlineKeyboardButton(
-            text="❌ Нет",
-            callback_data=f"cancel:{action}"
-        )
-    )
-    
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(
+                text="✅ Да",
+                callback_data=f"confirm:{action}:{item_id}"
+            ),
+            InlineKeyboardButton(
+                text="❌ Нет",
+                callback_data=f"cancel:{action}"
+            )
+        ]
+    ])
 
 
 def get_add_to_playlist_keyboard(
@@ -548,245 +610,244 @@ def get_add_to_playlist_keyboard(
     source: str
 ) -> InlineKeyboardMarkup:
     """Клавиатура добавления трека в плейлист"""
-    builder = InlineKeyboardBuilder()
-    
     # Существующие плейлисты
-    for playlist in playlists[:8]:  # Показываем максимум 8 плейлистов
-        title = playlist.title[:30] + "..." if len(playlist.title) > 30 else playlist.title
-        builder.row(
-            InlineKeyboardButton(
-                text=f"📋 {title}",
-                callback_data=f"add_track_to_playlist:{playlist.id}:{track_id}:{source}"
+    specs: List[List[ButtonSpec]] = [
+        [(
+            f"📋 {_truncate(playlist.title, 30)}",
+            pack_track_callback(
+                "add_track_to_playlist", str(playlist.id), track_id, source=source
             )
-        )
+        )]
+        for playlist in islice(playlists, ADD_TO_PLAYLIST_LIMIT)
+    ]
     
     # Создать новый плейлист
-    builder.row(
-        InlineKeyboardButton(
-            text="➕ Создать новый плейлист",
-            callback_data=f"create_playlist_with_track:{track_id}:{source}"
-        )
-    )
+    specs.append([(
+        "➕ Создать новый плейлист",
+        pack_track_callback("create_playlist_with_track", track_id, source=source)
+    )])
     
     # Назад
-    builder.row(
-        InlineKeyboardButton(
-            text="⬅️ Назад",
-            callback_data=f"track:{track_id}:{source}"
-        )
-    )
+    specs.append([("⬅️ Назад", f"track:{track_id}:{source}")])
     
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=_button_rows(specs))
 
 
-def get_trending_categories_keyboard() -> InlineKeyboardMarkup:
-    """Клавиатура категорий популярной музыки"""
-    builder = InlineKeyboardBuilder()
+async def get_add_to_playlist_keyboard_cached(
+    playlists: List[PlaylistResponse],
+    track_id: str,
+    source: str
+) -> InlineKeyboardMarkup:
+    """Клавиатура добавления трека в плейлист с кешированием в Redis
+
+    Ключ учитывает id и названия показываемых плейлистов, поэтому
+    переименование или новый плейлист дают новый ключ
+    """
+    if len(playlists) > ADD_TO_PLAYLIST_LIMIT:
+        return get_add_to_playlist_keyboard(playlists, track_id, source)
     
-    builder.row(
-        InlineKeyboardButton(text="🔥 Топ недели", callback_data="trending:week"),
-        InlineKeyboardButton(text="📈 Восходящие", callback_data="trending:rising")
-    )
-    builder.row(
-        InlineKeyboardButton(text="🆕 Новинки", callback_data="trending:new"),
-        InlineKeyboardButton(text="👑 Классика", callback_data="trending:classic")
-    )
-    builder.row(
-        InlineKeyboardButton(text="🎭 По жанрам", callback_data="genres"),
-        InlineKeyboardButton(text="🌍 По странам", callback_data="countries")
-    )
+    fingerprint = ",".join(f"{p.id}:{p.title}" for p in playlists)
+    key = hashlib.blake2b(
+        f"{track_id}|{source}|{fingerprint}".encode(), digest_size=16
+    ).hexdigest()
     
-    builder.row(
-        InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")
-    )
+    cached = await cache_service.get(f"atpl:{key}", cache_type="keyboard")
+    if cached:
+        return InlineKeyboardMarkup.model_validate_json(cached)
     
-    return builder.as_markup()
+    markup = get_add_to_playlist_keyboard(playlists, track_id, source)
+    await cache_service.set(
+        f"atpl:{key}", markup.model_dump_json(), cache_type="keyboard"
+    )
+    return markup
 
 
+@_static_markup
+def get_trending_categories_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура категорий популярной музыки"""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="🔥 Топ недели", callback_data="trending:week"),
+            InlineKeyboardButton(text="📈 Восходящие", callback_data="trending:rising")
+        ],
+        [
+            InlineKeyboardButton(text="🆕 Новинки", callback_data="trending:new"),
+            InlineKeyboardButton(text="👑 Классика", callback_data="trending:classic")
+        ],
+        [
+            InlineKeyboardButton(text="🎭 По жанрам", callback_data="genres"),
+            InlineKeyboardButton(text="🌍 По странам", callback_data="countries")
+        ],
+        [
+            BTN_BACK_MAIN
+        ]
+    ])
+
+
+@_static_markup
 def get_genres_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура выбора жанров"""
-    builder = InlineKeyboardBuilder()
-    
-    genres = [
-        ("🎸 Rock", "rock"),
-        ("🎤 Pop", "pop"),
-        ("🎵 Hip-Hop", "hip-hop"),
-        ("🎹 Electronic", "electronic"),
-        ("🎺 Jazz", "jazz"),
-        ("🎻 Classical", "classical"),
-        ("🪕 Folk", "folk"),
-        ("🎷 Blues", "blues")
-    ]
+    specs = [(text, f"genre:{genre}") for text, genre in _GENRES]
     
     # По два жанра в ряд
-    for i in range(0, len(genres), 2):
-        row_buttons = [
-            InlineKeyboardButton(
-                text=genres[i][0],
-                callback_data=f"genre:{genres[i][1]}"
-            )
-        ]
-        
-        if i + 1 < len(genres):
-            row_buttons.append(
-                InlineKeyboardButton(
-                    text=genres[i + 1][0],
-                    callback_data=f"genre:{genres[i + 1][1]}"
-                )
-            )
-        
-        builder.row(*row_buttons)
+    rows = _button_rows(specs[i:i + 2] for i in range(0, len(specs), 2))
     
-    builder.row(
+    rows.append([
         InlineKeyboardButton(text="⬅️ Назад", callback_data="trending")
-    )
+    ])
     
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
 def get_inline_search_keyboard(track: SearchResult) -> InlineKeyboardMarkup:
     """Клавиатура для inline режима"""
-    builder = InlineKeyboardBuilder()
-    
-    # Кнопка для отправки трека в чат
-    builder.row(
-        InlineKeyboardButton(
-            text="🎧 Отправить в чат",
-            callback_data=f"send_to_chat:{track.external_id}:{track.source.value}"
-        )
-    )
-    
-    return builder.as_markup()
+    return _build_inline_search_keyboard(track.external_id, track.source.value)
+
+
+@lru_cache(maxsize=256)
+def _build_inline_search_keyboard(external_id: str, source: str) -> InlineKeyboardMarkup:
+    """Клавиатура для inline режима по хешируемым полям трека"""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        # Кнопка для отправки трека в чат
+        [
+            InlineKeyboardButton(
+                text="🎧 Отправить в чат",
+                callback_data=f"send_to_chat:{external_id}:{source}"
+            )
+        ]
+    ])
 
 
 def get_profile_keyboard(is_premium: bool = False) -> InlineKeyboardMarkup:
     """Клавиатура профиля пользователя"""
-    builder = InlineKeyboardBuilder()
+    rows: List[List[InlineKeyboardButton]] = []
     
-    builder.row(
+    rows.append([
         InlineKeyboardButton(text="📊 Моя статистика", callback_data="my_stats"),
         InlineKeyboardButton(text="🎵 История", callback_data="my_history")
-    )
+    ])
     
-    builder.row(
+    rows.append([
         InlineKeyboardButton(text="❤️ Избранное", callback_data="favorites"),
         InlineKeyboardButton(text="📋 Плейлисты", callback_data="my_playlists")
-    )
+    ])
     
     if is_premium:
-        builder.row(
+        rows.append([
             InlineKeyboardButton(text="💎 Premium статус", callback_data="premium_status"),
             InlineKeyboardButton(text="📱 Экспорт", callback_data="export_data")
-        )
+        ])
     else:
-        builder.row(
+        rows.append([
             InlineKeyboardButton(text="💎 Получить Premium", callback_data="premium")
-        )
+        ])
     
-    builder.row(
+    rows.append([
         InlineKeyboardButton(text="⚙️ Настройки", callback_data="settings"),
         InlineKeyboardButton(text="🆘 Помощь", callback_data="help")
-    )
+    ])
     
-    builder.row(
-        InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")
-    )
+    rows.append([
+        BTN_BACK_MAIN
+    ])
     
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@_static_markup
 def get_help_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура помощи"""
-    builder = InlineKeyboardBuilder()
-    
-    builder.row(
-        InlineKeyboardButton(text="❓ FAQ", callback_data="faq"),
-        InlineKeyboardButton(text="📘 Гид", callback_data="guide")
-    )
-    
-    builder.row(
-        InlineKeyboardButton(text="💬 Поддержка", url="https://t.me/support"),
-        InlineKeyboardButton(text="📢 Канал", url="https://t.me/musicbot_news")
-    )
-    
-    builder.row(
-        InlineKeyboardButton(text="⬅️ Назад", callback_data="profile")
-    )
-    
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="❓ FAQ", callback_data="faq"),
+            InlineKeyboardButton(text="📘 Гид", callback_data="guide")
+        ],
+        [
+            InlineKeyboardButton(text="💬 Поддержка", url="https://t.me/support"),
+            InlineKeyboardButton(text="📢 Канал", url="https://t.me/musicbot_news")
+        ],
+        [
+            InlineKeyboardButton(text="⬅️ Назад", callback_data="profile")
+        ]
+    ])
 
 
+@_static_markup
 def get_admin_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура админ панели"""
-    builder = InlineKeyboardBuilder()
-    
-    builder.row(
-        InlineKeyboardButton(text="👥 Пользователи", callback_data="admin:users"),
-        InlineKeyboardButton(text="📊 Аналитика", callback_data="admin:analytics")
-    )
-    
-    builder.row(
-        InlineKeyboardButton(text="💰 Платежи", callback_data="admin:payments"),
-        InlineKeyboardButton(text="🎵 Контент", callback_data="admin:content")
-    )
-    
-    builder.row(
-        InlineKeyboardButton(text="📢 Рассылка", callback_data="admin:broadcast"),
-        InlineKeyboardButton(text="⚙️ Настройки", callback_data="admin:settings")
-    )
-    
-    builder.row(
-        InlineKeyboardButton(text="🌐 Веб-панель", url="https://admin.musicbot.com")
-    )
-    
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="👥 Пользователи", callback_data="admin:users"),
+            InlineKeyboardButton(text="📊 Аналитика", callback_data="admin:analytics")
+        ],
+        [
+            InlineKeyboardButton(text="💰 Платежи", callback_data="admin:payments"),
+            InlineKeyboardButton(text="🎵 Контент", callback_data="admin:content")
+        ],
+        [
+            InlineKeyboardButton(text="📢 Рассылка", callback_data="admin:broadcast"),
+            InlineKeyboardButton(text="⚙️ Настройки", callback_data="admin:settings")
+        ],
+        [
+            InlineKeyboardButton(text="🌐 Веб-панель", url="https://admin.musicbot.com")
+        ]
+    ])
 
 
+@_static_markup
 def get_broadcast_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для рассылки"""
-    builder = InlineKeyboardBuilder()
-    
-    builder.row(
-        InlineKeyboardButton(text="👥 Всем пользователям", callback_data="broadcast:all"),
-        InlineKeyboardButton(text="💎 Premium", callback_data="broadcast:premium")
-    )
-    
-    builder.row(
-        InlineKeyboardButton(text="🆓 Free пользователи", callback_data="broadcast:free"),
-        InlineKeyboardButton(text="😴 Неактивные", callback_data="broadcast:inactive")
-    )
-    
-    builder.row(
-        InlineKeyboardButton(text="⬅️ Назад", callback_data="admin:main")
-    )
-    
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="👥 Всем пользователям", callback_data="broadcast:all"),
+            InlineKeyboardButton(text="💎 Premium", callback_data="broadcast:premium")
+        ],
+        [
+            InlineKeyboardButton(text="🆓 Free пользователи", callback_data="broadcast:free"),
+            InlineKeyboardButton(text="😴 Неактивные", callback_data="broadcast:inactive")
+        ],
+        [
+            InlineKeyboardButton(text="⬅️ Назад", callback_data="admin:main")
+        ]
+    ])
 
 
+@_static_markup
 def get_back_to_menu_keyboard() -> InlineKeyboardMarkup:
     """Простая клавиатура возврата в главное меню"""
-    builder = InlineKeyboardBuilder()
-    
-    builder.row(
-        InlineKeyboardButton(text="🏠 Главное меню", callback_data="main_menu")
-    )
-    
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="🏠 Главное меню", callback_data="main_menu")
+        ]
+    ])
 
 
+@_static_markup
 def get_cancel_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура отмены действия"""
-    builder = InlineKeyboardBuilder()
-    
-    builder.row(
-        InlineKeyboardButton(text="❌ Отмена", callback_data="cancel")
-    )
-    
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            BTN_CANCEL
+        ]
+    ])
 
 
 # Утилитарные функции для работы с клавиатурами
 
+def _navigation_rows(
+    page: int,
+    total_pages: int,
+    callback_prefix: str,
+    back_callback: str = "main_menu"
+) -> List[List[InlineKeyboardButton]]:
+    """Ряды кнопок навигации"""
+    return [
+        list(_nav_row(page, total_pages, callback_prefix)),
+        # Кнопка назад
+        [InlineKeyboardButton(text="⬅️ Назад", callback_data=back_callback)]
+    ]
+
+
 def add_navigation_buttons(
     builder: InlineKeyboardBuilder,
     page: int,
@@ -795,62 +856,26 @@ def add_navigation_buttons(
     back_callback: str = "main_menu"
 ) -> None:
     """Добавить кнопки навигации"""
-    nav_buttons = []
-    
-    if page > 0:
-        nav_buttons.append(
-            InlineKeyboardButton(
-                text="⬅️",
-                callback_data=f"{callback_prefix}:{page-1}"
-            )
-        )
-    
-    nav_buttons.append(
-        InlineKeyboardButton(
-            text=f"{page + 1}/{total_pages}",
-            callback_data="current_page"
-        )
-    )
-    
-    if page < total_pages - 1:
-        nav_buttons.append(
-            InlineKeyboardButton(
-                text="➡️",
-                callback_data=f"{callback_prefix}:{page+1}"
-            )
-        )
-    
-    if nav_buttons:
-        builder.row(*nav_buttons)
-    
-    # Кнопка назад
-    builder.row(
-        InlineKeyboardButton(text="⬅️ Назад", callback_data=back_callback)
-    )
+    for row in _navigation_rows(page, total_pages, callback_prefix, back_callback):
+        builder.row(*row)
 
 
 def create_paginated_keyboard(
-    items: List[tuple],  # (text, callback_data)
+    items: List[ButtonSpec],
     page: int = 0,
     per_page: int = 8,
     callback_prefix: str = "page",
     back_callback: str = "main_menu"
 ) -> InlineKeyboardMarkup:
     """Создать пагинированную клавиатуру"""
-    builder = InlineKeyboardBuilder()
-    
     start_idx = page * per_page
     end_idx = start_idx + per_page
-    page_items = items[start_idx:end_idx]
     
     # Добавляем элементы страницы
-    for text, callback_data in page_items:
-        builder.row(
-            InlineKeyboardButton(text=text, callback_data=callback_data)
-        )
+    rows = _button_rows([item] for item in islice(items, start_idx, end_idx))
     
     # Добавляем навигацию
-    total_pages = (len(items) - 1) // per_page + 1 if items else 1
-    add_navigation_buttons(builder, page, total_pages, callback_prefix, back_callback)
+    total_pages = -(-len(items) // per_page) or 1
+    rows.extend(_navigation_rows(page, total_pages, callback_prefix, back_callback))
     
-    return builder.as_markup()
\ No newline at end of file
+    return InlineKeyboardMarkup(inline_keyboard=rows)
@@ -1,380 +1,440 @@
 """
 Reply клавиатуры для музыкального бота
 """
-from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
-from aiogram.utils.keyboard import ReplyKeyboardBuilder
+from itertools import batched
+from typing import Final, Sequence
+from aiogram.types import ReplyKeyboardMarkup, ReplyKeyboardRemove, KeyboardButton
 
 
-def get_main_reply_keyboard(is_premium: bool = False) -> ReplyKeyboardMarkup:
-    """Основная reply клавиатура"""
-    builder = ReplyKeyboardBuilder()
-    
+# Тексты кнопок, с которыми сравнивают сообщения обработчики
+BTN_SEARCH: Final = "🔍 Поиск"
+BTN_POPULAR: Final = "🔥 Популярное"
+BTN_PLAYLISTS: Final = "📋 Плейлисты"
+BTN_FAVORITES: Final = "❤️ Избранное"
+BTN_PROFILE: Final = "👤 Профиль"
+BTN_SETTINGS: Final = "⚙️ Настройки"
+BTN_GET_PREMIUM: Final = "💎 Получить Premium"
+BTN_PREMIUM: Final = "💎 Premium"
+BTN_HELP: Final = "🆘 Помощь"
+BTN_MAIN_MENU: Final = "🏠 Главное меню"
+BTN_BACK: Final = "⬅️ Назад"
+BTN_CANCEL: Final = "❌ Отмена"
+BTN_YES: Final = "✅ Да"
+BTN_NO: Final = "❌ Нет"
+
+# Все тексты основной клавиатуры для фильтров F.text.in_(...)
+MAIN_MENU_TEXTS: frozenset[str] = frozenset({
+    BTN_SEARCH, BTN_POPULAR,
+    BTN_PLAYLISTS, BTN_FAVORITES,
+    BTN_PROFILE, BTN_SETTINGS,
+    BTN_GET_PREMIUM, BTN_PREMIUM, BTN_HELP,
+})
+
+
+# Общие ряды основной клавиатуры
+_MAIN_ROWS = [
     # Первый ряд - основные функции
-    builder.row(
-        KeyboardButton(text="🔍 Поиск"),
-        KeyboardButton(text="🔥 Популярное")
-    )
-    
+    [
+        KeyboardButton(text=BTN_SEARCH),
+        KeyboardButton(text=BTN_POPULAR)
+    ],
     # Второй ряд - плейлисты и избранное
-    builder.row(
-        KeyboardButton(text="📋 Плейлисты"),
-        KeyboardButton(text="❤️ Избранное")
-    )
-    
+    [
+        KeyboardButton(text=BTN_PLAYLISTS),
+        KeyboardButton(text=BTN_FAVORITES)
+    ],
     # Третий ряд - профиль и настройки
-    builder.row(
-        KeyboardButton(text="👤 Профиль"),
-        KeyboardButton(text="⚙️ Настройки")
-    )
-    
-    # Четвертый ряд - Premium или помощь
-    if is_premium:
-        builder.row(
-            KeyboardButton(text="💎 Premium"),
-            KeyboardButton(text="🆘 Помощь")
-        )
-    else:
-        builder.row(
-            KeyboardButton(text="💎 Получить Premium"),
-            KeyboardButton(text="🆘 Помощь")
-        )
-    
-    return builder.as_markup(resize_keyboard=True, one_time_keyboard=False)
+    [
+        KeyboardButton(text=BTN_PROFILE),
+        KeyboardButton(text=BTN_SETTINGS)
+    ]
+]
+
+# Четвертый ряд - Premium или помощь
+_MAIN_KB_FREE = ReplyKeyboardMarkup(
+    keyboard=[
+        *_MAIN_ROWS,
+        [
+            KeyboardButton(text=BTN_GET_PREMIUM),
+            KeyboardButton(text=BTN_HELP)
+        ]
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=False
+)
+_MAIN_KB_PREMIUM = ReplyKeyboardMarkup(
+    keyboard=[
+        *_MAIN_ROWS,
+        [
+            KeyboardButton(text=BTN_PREMIUM),
+            KeyboardButton(text=BTN_HELP)
+        ]
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=False
+)
+
+
+def get_main_reply_keyboard(is_premium: bool = False) -> ReplyKeyboardMarkup:
+    """Основная reply клавиатура"""
+    return _MAIN_KB_PREMIUM if is_premium else _MAIN_KB_FREE
+
+
+_SEARCH_KB = ReplyKeyboardMarkup(
+    keyboard=[
+        # Быстрые поисковые запросы
+        [
+            KeyboardButton(text="🎤 Популярные исполнители"),
+            KeyboardButton(text="🎵 Новинки 2024")
+        ],
+        [
+            KeyboardButton(text="🎸 Рок"),
+            KeyboardButton(text="🎹 Поп")
+        ],
+        [
+            KeyboardButton(text="🎧 Электронная"),
+            KeyboardButton(text="🎺 Джаз")
+        ],
+        # Специальные функции
+        [
+            KeyboardButton(text="🎯 Рекомендации"),
+            KeyboardButton(text="🔀 Случайная")
+        ],
+        # Возврат в главное меню
+        [
+            KeyboardButton(text=BTN_MAIN_MENU)
+        ]
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=False
+)
 
 
 def get_search_keyboard() -> ReplyKeyboardMarkup:
     """Клавиатура для поиска"""
-    builder = ReplyKeyboardBuilder()
-    
-    # Быстрые поисковые запросы
-    builder.row(
-        KeyboardButton(text="🎤 Популярные исполнители"),
-        KeyboardButton(text="🎵 Новинки 2024")
-    )
-    
-    builder.row(
-        KeyboardButton(text="🎸 Рок"),
-        KeyboardButton(text="🎹 Поп")
-    )
-    
-    builder.row(
-        KeyboardButton(text="🎧 Электронная"),
-        KeyboardButton(text="🎺 Джаз")
-    )
-    
-    # Специальные функции
-    builder.row(
-        KeyboardButton(text="🎯 Рекомендации"),
-        KeyboardButton(text="🔀 Случайная")
-    )
-    
-    # Возврат в главное меню
-    builder.row(
-        KeyboardButton(text="🏠 Главное меню")
-    )
-    
-    return builder.as_markup(resize_keyboard=True, one_time_keyboard=False)
+    return _SEARCH_KB
+
+
+_PLAYLIST_KB = ReplyKeyboardMarkup(
+    keyboard=[
+        # Основные действия
+        [
+            KeyboardButton(text="📋 Мои плейлисты"),
+            KeyboardButton(text="➕ Создать плейлист")
+        ],
+        [
+            KeyboardButton(text="🔍 Найти плейлист"),
+            KeyboardButton(text="📊 Статистика")
+        ],
+        # Публичные плейлисты
+        [
+            KeyboardButton(text="🌟 Популярные плейлисты"),
+            KeyboardButton(text="🎭 По жанрам")
+        ],
+        # Импорт/экспорт
+        [
+            KeyboardButton(text="📥 Импорт"),
+            KeyboardButton(text="📤 Экспорт")
+        ],
+        # Назад
+        [
+            KeyboardButton(text=BTN_MAIN_MENU)
+        ]
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=False
+)
 
 
 def get_playlist_management_keyboard() -> ReplyKeyboardMarkup:
     """Клавиатура управления плейлистами"""
-    builder = ReplyKeyboardBuilder()
-    
-    # Основные действия
-    builder.row(
-        KeyboardButton(text="📋 Мои плейлисты"),
-        KeyboardButton(text="➕ Создать плейлист")
-    )
-    
-    builder.row(
-        KeyboardButton(text="🔍 Найти плейлист"),
-        KeyboardButton(text="📊 Статистика")
-    )
-    
-    # Публичные плейлисты
-    builder.row(
-        KeyboardButton(text="🌟 Популярные плейлисты"),
-        KeyboardButton(text="🎭 По жанрам")
-    )
-    
-    # Импорт/экспорт
-    builder.row(
-        KeyboardButton(text="📥 Импорт"),
-        KeyboardButton(text="📤 Экспорт")
-    )
-    
-    # Назад
-    builder.row(
-        KeyboardButton(text="🏠 Главное меню")
-    )
-    
-    return builder.as_markup(resize_keyboard=True, one_time_keyboard=False)
+    return _PLAYLIST_KB
+
+
+_PREMIUM_KB = ReplyKeyboardMarkup(
+    keyboard=[
+        # Premium функции
+        [
+            KeyboardButton(text="💎 Мой Premium"),
+            KeyboardButton(text="📊 Расширенная статистика")
+        ],
+        [
+            KeyboardButton(text="🎵 Высокое качество"),
+            KeyboardButton(text="📥 Массовое скачивание")
+        ],
+        [
+            KeyboardButton(text="🎯 Умные рекомендации"),
+            KeyboardButton(text="🚫 Без рекламы")
+        ],
+        # Управление подпиской
+        [
+            KeyboardButton(text="🔄 Продлить подписку"),
+            KeyboardButton(text="📋 История платежей")
+        ],
+        # Назад
+        [
+            KeyboardButton(text=BTN_MAIN_MENU)
+        ]
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=False
+)
 
 
 def get_premium_keyboard() -> ReplyKeyboardMarkup:
     """Клавиатура Premium функций"""
-    builder = ReplyKeyboardBuilder()
-    
-    # Premium функции
-    builder.row(
-        KeyboardButton(text="💎 Мой Premium"),
-        KeyboardButton(text="📊 Расширенная статистика")
-    )
-    
-    builder.row(
-        KeyboardButton(text="🎵 Высокое качество"),
-        KeyboardButton(text="📥 Массовое скачивание")
-    )
-    
-    builder.row(
-        KeyboardButton(text="🎯 Умные рекомендации"),
-        KeyboardButton(text="🚫 Без рекламы")
-    )
-    
-    # Управление подпиской
-    builder.row(
-        KeyboardButton(text="🔄 Продлить подписку"),
-        KeyboardButton(text="📋 История платежей")
-    )
-    
-    # Назад
-    builder.row(
-        KeyboardButton(text="🏠 Главное меню")
-    )
-    
-    return builder.as_markup(resize_keyboard=True, one_time_keyboard=False)
+    return _PREMIUM_KB
+
+
+_SETTINGS_KB = ReplyKeyboardMarkup(
+    keyboard=[
+        # Основные настройки
+        [
+            KeyboardButton(text="🎵 Качество аудио"),
+            KeyboardButton(text="🔔 Уведомления")
+        ],
+        [
+            KeyboardButton(text="🌐 Язык интерфейса"),
+            KeyboardButton(text="🎯 Рекомендации")
+        ],
+        # Приватность и данные
+        [
+            KeyboardButton(text="🔒 Приватность"),
+            KeyboardButton(text="📊 Мои данные")
+        ],
+        # Дополнительные настройки
+        [
+            KeyboardButton(text="🎨 Тема оформления"),
+            KeyboardButton(text="⚡ Быстрые действия")
+        ],
+        # Экспорт и удаление
+        [
+            KeyboardButton(text="📦 Экспорт данных"),
+            KeyboardButton(text="🗑️ Удалить аккаунт")
+        ],
+        # Назад
+        [
+            KeyboardButton(text=BTN_MAIN_MENU)
+        ]
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=False
+)
 
 
 def get_settings_keyboard() -> ReplyKeyboardMarkup:
     """Клавиатура настроек"""
-    builder = ReplyKeyboardBuilder()
-    
-    # Основные настройки
-    builder.row(
-        KeyboardButton(text="🎵 Качество аудио"),
-        KeyboardButton(text="🔔 Уведомления")
-    )
-    
-    builder.row(
-        KeyboardButton(text="🌐 Язык интерфейса"),
-        KeyboardButton(text="🎯 Рекомендации")
-    )
-    
-    # Приватность и данные
-    builder.row(
-        KeyboardButton(text="🔒 Приватность"),
-        KeyboardButton(text="📊 Мои данные")
-    )
-    
-    # Дополнительные настройки
-    builder.row(
-        KeyboardButton(text="🎨 Тема оформления"),
-        KeyboardButton(text="⚡ Быстрые действия")
-    )
-    
-    # Экспорт и удаление
-    builder.row(
-        KeyboardButton(text="📦 Экспорт данных"),
-        KeyboardButton(text="🗑️ Удалить аккаунт")
-    )
-    
-    # Назад
-    builder.row(
-        KeyboardButton(text="🏠 Главное меню")
-    )
-    
-    return builder.as_markup(resize_keyboard=True, one_time_keyboard=False)
+    return _SETTINGS_KB
+
+
+_ADMIN_KB = ReplyKeyboardMarkup(
+    keyboard=[
+        # Управление пользователями
+        [
+            KeyboardButton(text="👥 Пользователи"),
+            KeyboardButton(text="📊 Аналитика")
+        ],
+        # Контент и модерация
+        [
+            KeyboardButton(text="🎵 Модерация контента"),
+            KeyboardButton(text=BTN_PLAYLISTS)
+        ],
+        # Финансы и платежи
+        [
+            KeyboardButton(text="💰 Платежи"),
+            KeyboardButton(text="💎 Подписки")
+        ],
+        # Рассылки и уведомления
+        [
+            KeyboardButton(text="📢 Рассылка"),
+            KeyboardButton(text="🔔 Уведомления")
+        ],
+        # Система и настройки
+        [
+            KeyboardButton(text="⚙️ Настройки системы"),
+            KeyboardButton(text="🔧 Техническое")
+        ],
+        # Логи и мониторинг
+        [
+            KeyboardButton(text="📝 Логи"),
+            KeyboardButton(text="📈 Мониторинг")
+        ],
+        # Выход из админки
+        [
+            KeyboardButton(text="🚪 Обычный режим")
+        ]
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=False
+)
 
 
 def get_admin_keyboard() -> ReplyKeyboardMarkup:
     """Административная клавиатура"""
-    builder = ReplyKeyboardBuilder()
-    
-    # Управление пользователями
-    builder.row(
-        KeyboardButton(text="👥 Пользователи"),
-        KeyboardButton(text="📊 Аналитика")
-    )
-    
-    # Контент и модерация
-    builder.row(
-        KeyboardButton(text="🎵 Модерация контента"),
-        KeyboardButton(text="📋 Плейлисты")
-    )
-    
-    # Финансы и платежи
-    builder.row(
-        KeyboardButton(text="💰 Платежи"),
-        KeyboardButton(text="💎 Подписки")
-    )
-    
-    # Рассылки и уведомления
-    builder.row(
-        KeyboardButton(text="📢 Рассылка"),
-        KeyboardButton(text="🔔 Уведомления")
-    )
-    
-    # Система и настройки
-    builder.row(
-        KeyboardButton(text="⚙️ Настройки системы"),
-        KeyboardButton(text="🔧 Техническое")
-    )
-    
-    # Логи и мониторинг
-    builder.row(
-        KeyboardButton(text="📝 Логи"),
-        KeyboardButton(text="📈 Мониторинг")
-    )
-    
-    # Выход из админки
-    builder.row(
-        KeyboardButton(text="🚪 Обычный режим")
-    )
-    
-    return builder.as_markup(resize_keyboard=True, one_time_keyboard=False)
+    return _ADMIN_KB
+
+
+_CANCEL_KB = ReplyKeyboardMarkup(
+    keyboard=[
+        [
+            KeyboardButton(text=BTN_CANCEL)
+        ]
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=True
+)
 
 
 def get_cancel_keyboard() -> ReplyKeyboardMarkup:
     """Клавиатура отмены"""
-    builder = ReplyKeyboardBuilder()
-    
-    builder.row(
-        KeyboardButton(text="❌ Отмена")
-    )
-    
-    return builder.as_markup(resize_keyboard=True, one_time_keyboard=True)
+    return _CANCEL_KB
+
+
+_YES_NO_KB = ReplyKeyboardMarkup(
+    keyboard=[
+        [
+            KeyboardButton(text=BTN_YES),
+            KeyboardButton(text=BTN_NO)
+        ]
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=True
+)
 
 
 def get_yes_no_keyboard() -> ReplyKeyboardMarkup:
     """Клавиатура подтверждения (Да/Нет)"""
-    builder = ReplyKeyboardBuilder()
-    
-    builder.row(
-        KeyboardButton(text="✅ Да"),
-        KeyboardButton(text="❌ Нет")
-    )
-    
-    return builder.as_markup(resize_keyboard=True, one_time_keyboard=True)
+    return _YES_NO_KB
+
+
+_CONTACT_KB = ReplyKeyboardMarkup(
+    keyboard=[
+        [
+            KeyboardButton(text="📱 Поделиться контактом", request_contact=True)
+        ],
+        [
+            KeyboardButton(text=BTN_CANCEL)
+        ]
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=True
+)
 
 
 def get_contact_keyboard() -> ReplyKeyboardMarkup:
     """Клавиатура для отправки контакта"""
-    builder = ReplyKeyboardBuilder()
-    
-    builder.row(
-        KeyboardButton(text="📱 Поделиться контактом", request_contact=True)
-    )
-    
-    builder.row(
-        KeyboardButton(text="❌ Отмена")
-    )
-    
-    return builder.as_markup(resize_keyboard=True, one_time_keyboard=True)
+    return _CONTACT_KB
+
+
+_LOCATION_KB = ReplyKeyboardMarkup(
+    keyboard=[
+        [
+            KeyboardButton(text="📍 Поделиться местоположением", request_location=True)
+        ],
+        [
+            KeyboardButton(text=BTN_CANCEL)
+        ]
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=True
+)
 
 
 def get_location_keyboard() -> ReplyKeyboardMarkup:
     """Клавиатура для отправки местоположения"""
-    builder = ReplyKeyboardBuilder()
-    
-    builder.row(
-        KeyboardButton(text="📍 Поделиться местоположением", request_location=True)
-    )
-    
-    builder.row(
-        KeyboardButton(text="❌ Отмена")
-    )
-    
-    return builder.as_markup(resize_keyboard=True, one_time_keyboard=True)
+    return _LOCATION_KB
+
+
+_LANGUAGE_KB = ReplyKeyboardMarkup(
+    keyboard=[
+        # Популярные языки
+        [
+            KeyboardButton(text="🇷🇺 Русский"),
+            KeyboardButton(text="🇺🇸 English")
+        ],
+        [
+            KeyboardButton(text="🇺🇦 Українська"),
+            KeyboardButton(text="🇰🇿 Қазақша")
+        ],
+        [
+            KeyboardButton(text="🇪🇸 Español"),
+            KeyboardButton(text="🇫🇷 Français")
+        ],
+        [
+            KeyboardButton(text="🇩🇪 Deutsch"),
+            KeyboardButton(text="🇮🇹 Italiano")
+        ],
+        # Назад
+        [
+            KeyboardButton(text=BTN_BACK)
+        ]
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=True
+)
 
 
 def get_language_keyboard() -> ReplyKeyboardMarkup:
     """Клавиатура выбора языка"""
-    builder = ReplyKeyboardBuilder()
-    
-    # Популярные языки
-    builder.row(
-        KeyboardButton(text="🇷🇺 Русский"),
-        KeyboardButton(text="🇺🇸 English")
-    )
-    
-    builder.row(
-        KeyboardButton(text="🇺🇦 Українська"),
-        KeyboardButton(text="🇰🇿 Қазақша")
-    )
-    
-    builder.row(
-        KeyboardButton(text="🇪🇸 Español"),
-        KeyboardButton(text="🇫🇷 Français")
-    )
-    
-    builder.row(
-        KeyboardButton(text="🇩🇪 Deutsch"),
-        KeyboardButton(text="🇮🇹 Italiano")
-    )
-    
-    # Назад
-    builder.row(
-        KeyboardButton(text="⬅️ Назад")
-    )
-    
-    return builder.as_markup(resize_keyboard=True, one_time_keyboard=True)
+    return _LANGUAGE_KB
+
+
+_QUALITY_KB = ReplyKeyboardMarkup(
+    keyboard=[
+        # Качества аудио
+        [
+            KeyboardButton(text="🔻 128 kbps"),
+            KeyboardButton(text="🔸 192 kbps")
+        ],
+        [
+            KeyboardButton(text="🔹 256 kbps"),
+            KeyboardButton(text="💎 320 kbps")
+        ],
+        # Автоматическое качество
+        [
+            KeyboardButton(text="🤖 Автоматически")
+        ],
+        # Назад
+        [
+            KeyboardButton(text=BTN_BACK)
+        ]
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=True
+)
 
 
 def get_quality_keyboard() -> ReplyKeyboardMarkup:
     """Клавиатура выбора качества аудио"""
-    builder = ReplyKeyboardBuilder()
-    
-    # Качества аудио
-    builder.row(
-        KeyboardButton(text="🔻 128 kbps"),
-        KeyboardButton(text="🔸 192 kbps")
-    )
-    
-    builder.row(
-        KeyboardButton(text="🔹 256 kbps"),
-        KeyboardButton(text="💎 320 kbps")
-    )
-    
-    # Автоматическое качество
-    builder.row(
-        KeyboardButton(text="🤖 Автоматически")
-    )
-    
-    # Назад
-    builder.row(
-        KeyboardButton(text="⬅️ Назад")
-    )
-    
-    return builder.as_markup(resize_keyboard=True, one_time_keyboard=True)
+    return _QUALITY_KB
 
 
-def remove_keyboard() -> ReplyKeyboardMarkup:
+_REMOVE_KB = ReplyKeyboardRemove()
+
+
+def remove_keyboard() -> ReplyKeyboardRemove:
     """Убрать клавиатуру"""
-    from aiogram.types import ReplyKeyboardRemove
-    return ReplyKeyboardRemove()
+    return _REMOVE_KB
 
 
 # Утилитарные функции
 
-def create_quick_keyboard(buttons: list, row_width: int = 2) -> ReplyKeyboardMarkup:
+def create_quick_keyboard(buttons: Sequence[str], row_width: int = 2) -> ReplyKeyboardMarkup:
     """Создать быструю клавиатуру из списка кнопок"""
-    builder = ReplyKeyboardBuilder()
-    
-    # Добавляем кнопки
-    for i in range(0, len(buttons), row_width):
-        row_buttons = []
-        for j in range(i, min(i + row_width, len(buttons))):
-            row_buttons.append(KeyboardButton(text=buttons[j]))
-        builder.row(*row_buttons)
-    
-    return builder.as_markup(resize_keyboard=True, one_time_keyboard=False)
-
-
-def create_menu_keyboard(menu_items: dict) -> ReplyKeyboardMarkup:
-    """Создать клавиатуру меню из словаря"""
-    builder = ReplyKeyboardBuilder()
-    
-    for text, callback in menu_items.items():
-        builder.row(KeyboardButton(text=text))
-    
-    return builder.as_markup(resize_keyboard=True, one_time_keyboard=False)
\ No newline at end of file
+    return ReplyKeyboardMarkup(
+        keyboard=[
+            [KeyboardButton(text=text) for text in row]
+            for row in batched(buttons, row_width)
+        ],
+        resize_keyboard=True,
+        one_time_keyboard=False
+    )
+
+
+def create_menu_keyboard(texts: Sequence[str]) -> ReplyKeyboardMarkup:
+    """Создать клавиатуру меню, по одной кнопке в ряд"""
+    return ReplyKeyboardMarkup(
+        keyboard=[[KeyboardButton(text=text)] for text in texts],
+        resize_keyboard=True,
+        one_time_keyboard=False
+    )
\ No newline at end of file
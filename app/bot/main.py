@@ -4,9 +4,13 @@
 """
 import asyncio
 import logging
+import signal
+import time
+import uuid
 from typing import Dict, Any
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 
+import orjson
 from aiogram import Bot, Dispatcher, Router
 from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.client.telegram import TelegramAPIServer
@@ -14,33 +18,45 @@ from aiogram.enums import ParseMode
 from aiogram.fsm.storage.redis import RedisStorage
 from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 from aiohttp import web
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
 
 from app.core.config import settings
-from app.core.logging import get_logger, bot_logger
+from app.core.logging import get_logger, bot_logger, set_request_id
 from app.core.redis import redis_manager
 from app.core.exceptions import ConfigurationError
 
-from app.bot.middlewares.auth import AuthMiddleware
-from app.bot.middlewares.throttling import ThrottlingMiddleware
-from app.bot.middlewares.logging import LoggingMiddleware
-from app.bot.middlewares.subscription import SubscriptionMiddleware
+from app.bot.middlewares.pipeline import BotPipelineMiddleware
 
 from app.bot.handlers.start import router as start_router
 from app.bot.handlers.search import router as search_router
-from app.bot.handlers.playlist import router as playlist_router
+from app.bot.handlers.playlist import playlist_router
 from app.bot.handlers.profile import router as profile_router
 from app.bot.handlers.premium import router as premium_router
 from app.bot.handlers.inline import router as inline_router
 from app.bot.handlers.admin import router as admin_router
 
-from app.services import service_manager
+from app.services import service_manager, user_service
 
 logger = get_logger(__name__)
 
+# Типы обновлений, которые бот получает от Telegram (webhook и polling)
+_ALLOWED_UPDATES = ("message", "callback_query", "inline_query", "chosen_inline_result")
+
+# Параметры пула соединений HTTP-сессии бота
+BOT_SESSION_LIMIT = 200
+BOT_SESSION_TIMEOUT = 60
+
+
+def _orjson_dumps(value: Any) -> str:
+    """Сериализация JSON для сессии бота (aiogram ожидает str)"""
+    return orjson.dumps(value).decode()
+
 
 class MusicBot:
     """Класс музыкального бота"""
     
+    __slots__ = ("bot", "dispatcher", "storage", "_webhook_app")
+    
     def __init__(self):
         self.bot: Bot = None
         self.dispatcher: Dispatcher = None
@@ -52,12 +68,17 @@ class MusicBot:
         if not settings.BOT_TOKEN:
             raise ConfigurationError("BOT_TOKEN", "Bot token not configured")
         
-        # Настройка сессии
+        # Настройка сессии: общий пул соединений к Bot API, JSON через orjson
+        # (тот же json_loads разбирает входящие обновления webhook).
         session = AiohttpSession(
             api=TelegramAPIServer.from_base(
                 'https://api.telegram.org',
                 is_local=False
-            )
+            ),
+            limit=BOT_SESSION_LIMIT,
+            timeout=BOT_SESSION_TIMEOUT,
+            json_loads=orjson.loads,
+            json_dumps=_orjson_dumps
         )
         
         # Создание бота
@@ -70,9 +91,9 @@ class MusicBot:
         # Проверка токена
         try:
             bot_info = await bot.get_me()
-            logger.info(f"Bot created: @{bot_info.username} ({bot_info.first_name})")
+            logger.info("Bot created: @%s (%s)", bot_info.username, bot_info.first_name)
         except Exception as e:
-            logger.error(f"Failed to get bot info: {e}")
+            logger.error("Failed to get bot info: %s", e)
             raise ConfigurationError("BOT_TOKEN", "Invalid bot token")
         
         self.bot = bot
@@ -102,26 +123,12 @@ class MusicBot:
     
     def _register_middlewares(self, dp: Dispatcher):
         """Регистрация middleware"""
-        # Порядок важен - middleware выполняются в порядке регистрации
+        # Аутентификация, throttling, проверка подписки и логирование
+        # выполняются одним middleware; экземпляр общий для всех типов обновлений
+        pipeline_mw = BotPipelineMiddleware()
         
-        # Логирование (первый - для отслеживания всех обновлений)
-        dp.message.middleware(LoggingMiddleware())
-        dp.callback_query.middleware(LoggingMiddleware())
-        dp.inline_query.middleware(LoggingMiddleware())
-        
-        # Аутентификация и создание пользователей
-        dp.message.middleware(AuthMiddleware())
-        dp.callback_query.middleware(AuthMiddleware())
-        dp.inline_query.middleware(AuthMiddleware())
-        
-        # Throttling (защита от спама)
-        dp.message.middleware(ThrottlingMiddleware())
-        dp.callback_query.middleware(ThrottlingMiddleware())
-        dp.inline_query.middleware(ThrottlingMiddleware())
-        
-        # Проверка подписки (последний - после всех проверок)
-        dp.message.middleware(SubscriptionMiddleware())
-        dp.callback_query.middleware(SubscriptionMiddleware())
+        for observer in (dp.message, dp.callback_query, dp.inline_query):
+            observer.middleware(pipeline_mw)
         
         logger.info("Middlewares registered")
     
@@ -140,9 +147,9 @@ class MusicBot:
         for name, router in routers:
             try:
                 dp.include_router(router)
-                logger.info(f"Router '{name}' registered")
+                logger.info("Router '%s' registered", name)
             except Exception as e:
-                logger.error(f"Failed to register router '{name}': {e}")
+                logger.error("Failed to register router '%s': %s", name, e)
         
         logger.info("All routers registered")
     
@@ -153,7 +160,8 @@ class MusicBot:
         async def global_error_handler(event, exception):
             """Глобальный обработчик ошибок"""
             logger.error(
-                f"Unhandled bot error: {exception}",
+                "Unhandled bot error: %s",
+                exception,
                 update_type=event.update.event_type if event.update else "unknown",
                 user_id=event.update.event.from_user.id if hasattr(event.update.event, 'from_user') else None,
                 error_type=type(exception).__name__
@@ -168,7 +176,7 @@ class MusicBot:
                         parse_mode=ParseMode.HTML
                     )
                 except Exception as send_error:
-                    logger.error(f"Failed to send error message: {send_error}")
+                    logger.error("Failed to send error message: %s", send_error)
             
             return True  # Помечаем ошибку как обработанную
         
@@ -184,11 +192,11 @@ class MusicBot:
         # Устанавливаем webhook
         await self.bot.set_webhook(
             url=webhook_url,
-            allowed_updates=["message", "callback_query", "inline_query", "chosen_inline_result"],
+            allowed_updates=_ALLOWED_UPDATES,
             drop_pending_updates=True
         )
         
-        logger.info(f"Webhook set to: {webhook_url}")
+        logger.info("Webhook set to: %s", webhook_url)
         
         # Настраиваем обработчик webhook
         SimpleRequestHandler(
@@ -211,12 +219,12 @@ class MusicBot:
                 self.bot,
                 polling_timeout=30,
                 handle_as_tasks=True,
-                allowed_updates=["message", "callback_query", "inline_query", "chosen_inline_result"]
+                allowed_updates=_ALLOWED_UPDATES
             )
         except KeyboardInterrupt:
             logger.info("Bot stopped by user")
         except Exception as e:
-            logger.error(f"Polling error: {e}")
+            logger.error("Polling error: %s", e)
             raise
     
     async def stop(self):
@@ -235,7 +243,7 @@ class MusicBot:
             logger.info("Bot stopped successfully")
             
         except Exception as e:
-            logger.error(f"Error stopping bot: {e}")
+            logger.error("Error stopping bot: %s", e)
 
 
 # Глобальный экземпляр бота
@@ -245,17 +253,35 @@ music_bot = MusicBot()
 @asynccontextmanager
 async def bot_lifespan():
     """Контекст менеджер для жизненного цикла бота"""
+    last_seen_task = None
     try:
-        # Инициализация сервисов
-        await service_manager.initialize_all()
+        # Инициализация сервисов и создание бота независимы - выполняем параллельно.
+        # Дожидаемся обеих задач, чтобы очистка в finally не началась
+        # одновременно с еще идущей инициализацией.
+        results = await asyncio.gather(
+            service_manager.initialize_all(),
+            music_bot.create_bot(),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
         
-        # Создание бота и диспетчера
-        await music_bot.create_bot()
+        # Диспетчер использует Redis storage, поэтому создается последним
         await music_bot.create_dispatcher()
         
+        # Фоновая запись активности пользователей
+        last_seen_task = asyncio.create_task(user_service.run_last_seen_flusher())
+        
         yield music_bot
         
     finally:
+        if last_seen_task:
+            last_seen_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await last_seen_task
+            await user_service.flush_last_seen()
+        
         # Остановка бота
         await music_bot.stop()
         
@@ -263,17 +289,28 @@ async def bot_lifespan():
         await service_manager.shutdown_all()
 
 
+def _json_response(data: Dict[str, Any], status: int = 200) -> web.Response:
+    """JSON-ответ, сериализованный через orjson"""
+    return web.Response(
+        body=orjson.dumps(data),
+        status=status,
+        content_type="application/json"
+    )
+
+
 async def create_webhook_app() -> web.Application:
     """Создание web приложения для webhook"""
     app = web.Application()
     
     # Middleware для логирования HTTP запросов
     async def logging_middleware(request, handler):
-        start_time = asyncio.get_event_loop().time()
+        # request_id попадает во все логи запроса (и апдейта, пришедшего через webhook)
+        set_request_id(request.headers.get("X-Request-ID") or uuid.uuid4().hex)
+        start_time = time.perf_counter()
         
         try:
             response = await handler(request)
-            duration = asyncio.get_event_loop().time() - start_time
+            duration = time.perf_counter() - start_time
             
             logger.info(
                 "HTTP request",
@@ -287,7 +324,7 @@ async def create_webhook_app() -> web.Application:
             return response
             
         except Exception as e:
-            duration = asyncio.get_event_loop().time() - start_time
+            duration = time.perf_counter() - start_time
             
             logger.error(
                 "HTTP request failed",
@@ -314,10 +351,10 @@ async def create_webhook_app() -> web.Application:
             elif health_status["overall_status"] == "degraded":
                 status_code = 206
             
-            return web.json_response(health_status, status=status_code)
+            return _json_response(health_status, status=status_code)
             
         except Exception as e:
-            return web.json_response(
+            return _json_response(
                 {"status": "error", "error": str(e)},
                 status=500
             )
@@ -326,17 +363,9 @@ async def create_webhook_app() -> web.Application:
     async def metrics(request):
         """Metrics endpoint"""
         try:
-            # Здесь можно интегрировать с prometheus_client
-            metrics_data = {
-                "bot_updates_total": 0,  # Счетчик обновлений
-                "bot_errors_total": 0,   # Счетчик ошибок
-                "active_users": 0,       # Активные пользователи
-                # Другие метрики...
-            }
-            
             return web.Response(
-                text="\n".join([f"{k} {v}" for k, v in metrics_data.items()]),
-                content_type="text/plain"
+                body=generate_latest(REGISTRY),
+                headers={"Content-Type": CONTENT_TYPE_LATEST}
             )
             
         except Exception as e:
@@ -369,16 +398,21 @@ async def run_webhook_app():
             port=settings.WEBHOOK_PORT
         )
         
-        logger.info(f"Starting webhook server on {settings.WEBHOOK_HOST}:{settings.WEBHOOK_PORT}")
+        logger.info("Starting webhook server on %s:%s", settings.WEBHOOK_HOST, settings.WEBHOOK_PORT)
         await site.start()
         
+        # Ждем сигнала остановки
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+        
         try:
-            # Ждем бесконечно
-            while True:
-                await asyncio.sleep(3600)
-        except KeyboardInterrupt:
-            logger.info("Webhook server stopped by user")
+            await stop_event.wait()
+            logger.info("Webhook server stopped by signal")
         finally:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(sig)
             await runner.cleanup()
 
 
@@ -388,16 +422,26 @@ async def run_polling():
         await bot.start_polling()
 
 
+def _run(coro) -> None:
+    """Запуск корутины в uvloop, если он доступен"""
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(coro)
+    else:
+        asyncio.run(coro, loop_factory=uvloop.new_event_loop)
+
+
 def main():
     """Главная функция"""
     import sys
     
     if len(sys.argv) > 1 and sys.argv[1] == "webhook":
         # Режим webhook
-        asyncio.run(run_webhook_app())
+        _run(run_webhook_app())
     else:
         # Режим polling (по умолчанию)
-        asyncio.run(run_polling())
+        _run(run_polling())
 
 
 if __name__ == "__main__":
@@ -1,19 +1,24 @@
 """
 Инициализация всех middleware для бота
+
+Экспортируются middleware, из которых состоит конвейер диспетчера.
+Остальные импортируются из своих модулей, например:
+from app.bot.middlewares.throttling import AntiFloodMiddleware
 """
-from app.bot.middlewares.auth import AuthMiddleware, UserDataMiddleware
-from app.bot.middlewares.throttling import ThrottlingMiddleware, AntiFloodMiddleware
-from app.bot.middlewares.logging import LoggingMiddleware, PerformanceMiddleware, ErrorHandlingMiddleware
-from app.bot.middlewares.subscription import SubscriptionMiddleware, DownloadLimitsMiddleware
+from app.bot.middlewares.context import RequestContext, UserSnapshot
+from app.bot.middlewares.auth import AuthMiddleware
+from app.bot.middlewares.throttling import RateLimitMiddleware, ThrottlingMiddleware
+from app.bot.middlewares.logging import LoggingMiddleware
+from app.bot.middlewares.subscription import SubscriptionMiddleware
+from app.bot.middlewares.pipeline import BotPipelineMiddleware
 
 __all__ = [
+    "RequestContext",
+    "UserSnapshot",
+    "RateLimitMiddleware",
     "AuthMiddleware",
-    "UserDataMiddleware", 
     "ThrottlingMiddleware",
-    "AntiFloodMiddleware",
     "LoggingMiddleware",
-    "PerformanceMiddleware", 
-    "ErrorHandlingMiddleware",
     "SubscriptionMiddleware",
-    "DownloadLimitsMiddleware"
-]
\ No newline at end of file
+    "BotPipelineMiddleware"
+]
@@ -1,23 +1,90 @@
 """
 Middleware для аутентификации и работы с пользователями
 """
-from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+from operator import attrgetter
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
 from datetime import datetime, timezone
 
 from aiogram import BaseMiddleware
-from aiogram.types import TelegramObject, User as TgUser, Update, Message, CallbackQuery
+from cachetools import TTLCache
+from aiogram.types import (
+    TelegramObject,
+    User as TgUser,
+    Update,
+    Message,
+    CallbackQuery,
+    InlineQuery,
+    ChosenInlineResult
+)
 
-from app.core.logging import get_logger, bot_logger
+from app.core.logging import get_logger, bot_logger, set_user_id
 from app.services.user_service import user_service
+from app.services.cache_service import user_cache
 from app.models.user import User
+from app.bot.middlewares.context import RequestContext, UserSnapshot
+
+# Сообщение заблокированному пользователю; подставляются причина и дата
+_BAN_TEMPLATE = (
+    "🚫 Ваш аккаунт заблокирован\n\n"
+    "Причина: {reason}\n"
+    "Дата блокировки: {date}\n\n"
+    "Для разблокировки обратитесь в поддержку: @support"
+)
+
+logger = get_logger(__name__)
+
+
+def _update_user(update: Update) -> Optional[TgUser]:
+    """Пользователь из вложенного события Update"""
+    for nested in (update.message, update.callback_query, update.inline_query):
+        if nested and nested.from_user:
+            return nested.from_user
+    return None
+
+
+def _get_update_event_type(update: Update) -> str:
+    """Тип вложенного события Update"""
+    if update.message:
+        return "message"
+    elif update.callback_query:
+        return "callback_query"
+    elif update.inline_query:
+        return "inline_query"
+    elif update.chosen_inline_result:
+        return "chosen_inline_result"
+    return "unknown"
+
+
+# Уже обработанные update_id: повторы Telegram после таймаута отсекаются до БД
+_seen_updates: TTLCache = TTLCache(maxsize=100_000, ttl=60)
+
+
+_from_user = attrgetter("from_user")
+
+# Диспетчеризация по точному типу события вместо цепочек hasattr/isinstance
+_USER_EXTRACTORS: Dict[type, Callable[[Any], Optional[TgUser]]] = {
+    Message: _from_user,
+    CallbackQuery: _from_user,
+    InlineQuery: _from_user,
+    ChosenInlineResult: _from_user,
+    Update: _update_user,
+}
+
+# Аргументы обработчиков, для которых нужны ORM объекты из БД
+_ORM_HANDLER_ARGS = frozenset({"user", "subscription"})
+
+_UPDATE_TYPES: Dict[type, str] = {
+    Message: "message",
+    CallbackQuery: "callback_query",
+    InlineQuery: "inline_query",
+    ChosenInlineResult: "chosen_inline_result",
+}
 
 
 class AuthMiddleware(BaseMiddleware):
     """Middleware для аутентификации пользователей"""
     
-    def __init__(self):
-        self.logger = get_logger(self.__class__.__name__)
-    
     async def __call__(
         self,
         handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
@@ -25,43 +92,69 @@ class AuthMiddleware(BaseMiddleware):
         data: Dict[str, Any]
     ) -> Any:
         """Основной метод middleware"""
+        if not await self.authenticate(event, data):
+            return
+        await self.load_handler_args(data)
+        return await handler(event, data)
+    
+    async def authenticate(self, event: TelegramObject, data: Dict[str, Any]) -> bool:
+        """Аутентификация и заполнение контекста пользователя
+
+        Возвращает False, если событие не должно обрабатываться дальше
+        """
+        ctx = data["ctx"] = RequestContext()
+        
+        # Повторная доставка того же обновления
+        update = event if type(event) is Update else data.get("event_update")
+        if update is not None:
+            if update.update_id in _seen_updates:
+                return False
+            _seen_updates[update.update_id] = None
         
         # Получаем пользователя из события
         tg_user = self._extract_user(event)
         if not tg_user:
-            return await handler(event, data)
+            return True
         
         # Проверяем, не бот ли это
         if tg_user.is_bot:
-            self.logger.warning(f"Bot user attempted to use service: {tg_user.id}")
-            return
+            logger.warning("Bot user attempted to use service: %s", tg_user.id)
+            return False
+        
+        # user_id попадает во все записи лога, сделанные при обработке события
+        set_user_id(tg_user.id)
         
         try:
-            # Получаем или создаем пользователя в БД
-            user = await user_service.get_or_create_user(
-                telegram_id=tg_user.id,
-                username=tg_user.username,
-                first_name=tg_user.first_name,
-                last_name=tg_user.last_name,
-                language_code=tg_user.language_code
-            )
+            # Снимок пользователя, лимиты, Premium и срок подписки - из кеша или из БД
+            bundle, user_row = await self._get_user_bundle(tg_user)
             
             # Проверяем, не заблокирован ли пользователь
-            if not user.is_active:
-                await self._handle_banned_user(event, user)
-                return
-            
-            # Обновляем время последней активности
-            await user_service.update_last_seen(tg_user.id)
+            if not bundle["is_active"]:
+                await self._handle_banned_user(event, tg_user.id)
+                return False
             
-            # Проверяем лимиты пользователя
-            limits = await user_service.check_daily_limits(tg_user.id)
+            # Отмечаем активность (в БД записывается пачками в фоне)
+            user_service.mark_seen(tg_user.id)
             
             # Добавляем данные в контекст
-            data["user"] = user
+            ctx.user = UserSnapshot(
+                id=bundle["id"],
+                telegram_id=tg_user.id,
+                is_active=bundle["is_active"],
+                language_code=bundle["language_code"]
+            )
+            ctx.tg_user = tg_user
+            ctx.user_limits = bundle["limits"]
+            ctx.is_premium = bundle["is_premium"]
+            ctx.subscription_expires_ts = bundle["subscription_expires_ts"]
+            
+            # Обработчики получают данные через аргументы; строка User,
+            # только что загруженная из БД, передается без повторного запроса
             data["tg_user"] = tg_user
-            data["user_limits"] = limits
-            data["is_premium"] = await user_service.is_premium_user(tg_user.id)
+            data["user_limits"] = ctx.user_limits
+            data["is_premium"] = ctx.is_premium
+            if user_row is not None:
+                data["user"] = user_row
             
             # Логируем активность
             await bot_logger.log_update(
@@ -72,62 +165,100 @@ class AuthMiddleware(BaseMiddleware):
             )
             
         except Exception as e:
-            self.logger.error(f"Auth middleware error for user {tg_user.id}: {e}")
+            logger.error("Auth middleware error for user %s: %s", tg_user.id, e)
             # Продолжаем выполнение даже при ошибке аутентификации
         
-        return await handler(event, data)
+        return True
+    
+    async def load_handler_args(self, data: Dict[str, Any]) -> None:
+        """Загрузка ORM объектов, которые принимает обработчик
+
+        user и subscription читаются из БД только для обработчиков с такими
+        аргументами. Без данных об обработчике (outer middleware) загружаются оба
+        """
+        ctx = data.get("ctx")
+        if ctx is None or ctx.user is None:
+            return
+        
+        handler = data.get("handler")
+        params = handler.params if handler is not None else _ORM_HANDLER_ARGS
+        telegram_id = ctx.user.telegram_id
+        
+        if "user" in params and "user" not in data:
+            data["user"] = await user_service.get_user_by_telegram_id(telegram_id)
+        if "subscription" in params and "subscription" not in data:
+            data["subscription"] = await user_service.get_user_subscription(telegram_id)
+    
+    async def _get_user_bundle(self, tg_user: TgUser) -> Tuple[Dict[str, Any], Optional[User]]:
+        """Снимок данных пользователя для контекста и строка User, если она загружалась
+
+        Снимок состоит из простых значений и берется из Redis одним HGETALL;
+        при промахе пользователь загружается (или создается) в БД, остальные
+        запросы выполняются параллельно
+        """
+        bundle = await user_cache.get_cached_user_bundle(tg_user.id)
+        if bundle is not None:
+            return bundle, None
+        
+        user = await user_service.get_or_create_user(
+            telegram_id=tg_user.id,
+            username=tg_user.username,
+            first_name=tg_user.first_name,
+            last_name=tg_user.last_name,
+            language_code=tg_user.language_code
+        )
+        
+        limits, is_premium, subscription = await asyncio.gather(
+            user_service.check_daily_limits(tg_user.id),
+            user_service.is_premium_user(tg_user.id),
+            user_service.get_user_subscription(tg_user.id)
+        )
+        
+        bundle = {
+            "id": user.id,
+            "telegram_id": tg_user.id,
+            "is_active": user.is_active,
+            "language_code": user.language_code,
+            "limits": limits,
+            "is_premium": is_premium,
+            # Срок подписки как Unix-время: проверка истечения без datetime
+            "subscription_expires_ts": (
+                subscription.expires_at.timestamp() if subscription else None
+            )
+        }
+        await user_cache.cache_user_bundle(tg_user.id, bundle)
+        return bundle, user
     
     def _extract_user(self, event: TelegramObject) -> Optional[TgUser]:
         """Извлечение пользователя из события"""
-        if hasattr(event, 'from_user'):
-            return event.from_user
-        elif hasattr(event, 'message') and hasattr(event.message, 'from_user'):
-            return event.message.from_user
-        elif isinstance(event, Update):
-            if event.message and event.message.from_user:
-                return event.message.from_user
-            elif event.callback_query and event.callback_query.from_user:
-                return event.callback_query.from_user
-            elif event.inline_query and event.inline_query.from_user:
-                return event.inline_query.from_user
-        return None
+        extractor = _USER_EXTRACTORS.get(type(event))
+        if extractor is None:
+            return getattr(event, 'from_user', None)
+        return extractor(event)
     
     def _get_update_type(self, event: TelegramObject) -> str:
         """Определение типа обновления"""
-        if isinstance(event, Message):
-            return "message"
-        elif isinstance(event, CallbackQuery):
-            return "callback_query"
-        elif hasattr(event, 'inline_query'):
-            return "inline_query"
-        elif isinstance(event, Update):
-            if event.message:
-                return "message"
-            elif event.callback_query:
-                return "callback_query"
-            elif event.inline_query:
-                return "inline_query"
-            elif event.chosen_inline_result:
-                return "chosen_inline_result"
-        return "unknown"
+        if type(event) is Update:
+            return _get_update_event_type(event)
+        return _UPDATE_TYPES.get(type(event), "unknown")
     
     def _extract_command(self, event: TelegramObject) -> Optional[str]:
         """Извлечение команды из события"""
         if isinstance(event, Message) and event.text:
             if event.text.startswith('/'):
-                return event.text.split()[0]
+                return event.text.split(maxsplit=1)[0]
         elif isinstance(event, CallbackQuery) and event.data:
-            return event.data.split(':')[0] if ':' in event.data else event.data
+            return event.data.partition(':')[0]
         return None
     
-    async def _handle_banned_user(self, event: TelegramObject, user: User) -> None:
+    async def _handle_banned_user(self, event: TelegramObject, telegram_id: int) -> None:
         """Обработка заблокированного пользователя"""
-        ban_message = (
-            f"🚫 Ваш аккаунт заблокирован\n\n"
-            f"Причина: {user.ban_reason or 'Не указана'}\n"
-            f"Дата блокировки: {user.banned_at.strftime('%d.%m.%Y %H:%M') if user.banned_at else 'Не указана'}\n\n"
-            f"Для разблокировки обратитесь в поддержку: @support"
-        )
+        # Причина и дата бана есть только в строке User - редкий путь, читаем из БД
+        user = await user_service.get_user_by_telegram_id(telegram_id)
+        ban_message = _BAN_TEMPLATE.format_map({
+            "reason": (user and user.ban_reason) or "Не указана",
+            "date": user.banned_at.strftime('%d.%m.%Y %H:%M') if user and user.banned_at else "Не указана"
+        })
         
         if isinstance(event, Message):
             try:
@@ -139,34 +270,3 @@ class AuthMiddleware(BaseMiddleware):
                 await event.answer(ban_message, show_alert=True)
             except:
                 pass
-
-
-class UserDataMiddleware(BaseMiddleware):
-    """Middleware для дополнительных данных пользователя"""
-    
-    async def __call__(
-        self,
-        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
-        event: TelegramObject,
-        data: Dict[str, Any]
-    ) -> Any:
-        """Добавление дополнительных данных пользователя"""
-        
-        user = data.get("user")
-        if not user:
-            return await handler(event, data)
-        
-        try:
-            # Получаем подписку пользователя
-            subscription = await user_service.get_user_subscription(user.telegram_id)
-            data["subscription"] = subscription
-            
-            # Получаем статистику пользователя (кешированно)
-            # stats = await user_service.get_user_stats(user.telegram_id)
-            # data["user_stats"] = stats
-            
-        except Exception as e:
-            logger = get_logger(self.__class__.__name__)
-            logger.error(f"UserData middleware error: {e}")
-        
-        return await handler(event, data)
\ No newline at end of file
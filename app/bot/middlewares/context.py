@@ -0,0 +1,36 @@
+"""
+Контекст пользователя для обработки события
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from aiogram.types import User as TgUser
+
+
+@dataclass(slots=True)
+class UserSnapshot:
+    """Поля пользователя, нужные middleware, без ORM объекта
+
+    Строится из кешированного снимка; строка User загружается из БД
+    только для обработчиков, которые принимают аргумент user
+    """
+    id: int
+    telegram_id: int
+    is_active: bool
+    language_code: Optional[str] = None
+
+
+@dataclass(slots=True)
+class RequestContext:
+    """Данные пользователя, которые AuthMiddleware кладет в data["ctx"]
+
+    Последующие middleware читают атрибуты одного объекта вместо
+    отдельных ключей словаря data. Обработчикам user_limits и is_premium
+    передаются ключами data, а user и subscription загружаются по требованию
+    """
+    user: Optional[UserSnapshot] = None
+    tg_user: Optional[TgUser] = None
+    is_premium: bool = False
+    user_limits: Optional[Dict[str, Any]] = None
+    # Срок подписки как Unix-время
+    subscription_expires_ts: Optional[float] = None
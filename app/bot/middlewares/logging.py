@@ -1,22 +1,113 @@
 """
 Middleware для логирования активности бота
 """
+import logging
 import time
-from typing import Any, Awaitable, Callable, Dict
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional
 from datetime import datetime, timezone
 
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, Message, CallbackQuery, InlineQuery, Update
 
-from app.core.logging import get_logger, bot_logger
+from app.core.logging import get_logger, bot_logger, is_enabled_for
+from app.core.metrics import BOT_UPDATES, BOT_ERRORS
+from app.models.user import User
+from app.models.analytics import EventType
 from app.services.analytics_service import analytics_service
+from app.bot.utils.tasks import fire_and_forget
+
+# Сообщение пользователю о необработанной ошибке
+_ERROR_MESSAGE = (
+    "❌ Произошла ошибка при обработке вашего запроса.\n\n"
+    "Попробуйте позже или обратитесь в поддержку: @support"
+)
+
+logger = get_logger(__name__)
+
+# Уровень логов задается настройками и не меняется во время работы
+_INFO_ENABLED = is_enabled_for(logging.INFO)
+
+
+class EventTrace(NamedTuple):
+    """Состояние логирования одного события между start и finish/fail"""
+    start_time: float
+    event: TelegramObject
+    user: Optional[User]
+    log_enabled: bool
+    event_info: Optional[Dict[str, Any]]
+
+
+def _message_info(event: Message) -> Dict[str, Any]:
+    """Информация о сообщении"""
+    return {
+        "type": "message",
+        "content": event.text[:100] if event.text else f"[{event.content_type}]",
+        "chat_type": event.chat.type if event.chat else None,
+        "chat_id": event.chat.id if event.chat else None,
+        "message_id": event.message_id,
+        "has_media": bool(event.photo or event.document or event.audio or event.video)
+    }
+
+
+def _callback_query_info(event: CallbackQuery) -> Dict[str, Any]:
+    """Информация о callback запросе"""
+    message = event.message
+    chat = message.chat if message else None
+    return {
+        "type": "callback_query",
+        "content": event.data[:100] if event.data else None,
+        "chat_type": chat.type if chat else None,
+        "chat_id": chat.id if chat else None,
+        "message_id": message.message_id if message else None
+    }
+
+
+def _inline_query_info(event: InlineQuery) -> Dict[str, Any]:
+    """Информация об inline запросе"""
+    return {
+        "type": "inline_query", 
+        "content": event.query[:100] if event.query else "",
+        "offset": event.offset,
+        "chat_type": "inline"
+    }
+
+
+def _update_info(event: Update) -> Dict[str, Any]:
+    """Информация о вложенном событии Update"""
+    for nested in (event.message, event.callback_query, event.inline_query):
+        if nested:
+            return _extract_event_info(nested)
+    return _unknown_info(event)
+
+
+def _unknown_info(event: TelegramObject) -> Dict[str, Any]:
+    """Информация о событии неизвестного типа"""
+    return {
+        "type": "unknown",
+        "content": str(event)[:100],
+        "chat_type": "unknown"
+    }
+
+
+# Диспетчеризация по точному типу события вместо цепочки isinstance
+_EVENT_INFO_EXTRACTORS: Dict[type, Callable[[Any], Dict[str, Any]]] = {
+    Message: _message_info,
+    CallbackQuery: _callback_query_info,
+    InlineQuery: _inline_query_info,
+    Update: _update_info,
+}
+
+
+def _extract_event_info(event: TelegramObject) -> Dict[str, Any]:
+    """Извлечение информации о событии"""
+    return _EVENT_INFO_EXTRACTORS.get(type(event), _unknown_info)(event)
 
 
 class LoggingMiddleware(BaseMiddleware):
     """Middleware для детального логирования"""
     
-    def __init__(self):
-        self.logger = get_logger(self.__class__.__name__)
+    def __init__(self, slow_threshold: float = 1.0):
+        self.slow_threshold = slow_threshold  # секунды
     
     async def __call__(
         self,
@@ -24,114 +115,108 @@ class LoggingMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: Dict[str, Any]
     ) -> Any:
-        """Логирование входящих событий и ответов"""
+        """Логирование входящих событий, ответов и медленных обработчиков"""
         
-        start_time = time.time()
-        user = data.get("user")
-        tg_user = data.get("tg_user")
+        BOT_UPDATES.inc()
+        trace = self.start(event, data)
         
-        # Информация о событии
-        event_info = self._extract_event_info(event)
+        try:
+            # Выполняем handler
+            result = await handler(event, data)
+        except Exception as e:
+            self.fail(trace, e)
+            raise
+        
+        self.finish(trace, handler)
+        return result
+    
+    def start(self, event: TelegramObject, data: Dict[str, Any]) -> EventTrace:
+        """Начало обработки события: таймер и лог входящего события"""
+        start_time = time.perf_counter()
+        ctx = data.get("ctx")
+        user = ctx.user if ctx else None
+        
+        # Информация о событии нужна только для логов уровня INFO и аналитики
+        log_enabled = _INFO_ENABLED
+        event_info = self._extract_event_info(event) if log_enabled or user else None
         
         # Логируем входящее событие
-        if user and tg_user:
-            self.logger.info(
+        if log_enabled and user and ctx.tg_user:
+            logger.info(
                 "Bot event received",
                 user_id=user.telegram_id,
-                username=tg_user.username,
+                username=ctx.tg_user.username,
                 event_type=event_info["type"],
                 content=event_info["content"],
                 chat_type=event_info.get("chat_type"),
-                is_premium=data.get("is_premium", False)
+                is_premium=ctx.is_premium
             )
         
-        try:
-            # Выполняем handler
-            result = await handler(event, data)
-            
-            # Время обработки
-            processing_time = time.time() - start_time
-            
-            # Логируем успешную обработку
-            self.logger.info(
+        return EventTrace(start_time, event, user, log_enabled, event_info)
+    
+    def finish(self, trace: EventTrace, handler: Callable[..., Any]) -> None:
+        """Успешная обработка: логи, медленные обработчики и аналитика"""
+        user = trace.user
+        event_info = trace.event_info
+        
+        # Время обработки
+        processing_time = time.perf_counter() - trace.start_time
+        
+        # Логируем успешную обработку
+        if trace.log_enabled:
+            logger.info(
                 "Bot event processed",
                 user_id=user.telegram_id if user else None,
                 event_type=event_info["type"],
                 processing_time_ms=round(processing_time * 1000, 2),
                 status="success"
             )
-            
-            # Отправляем аналитику
-            if user:
-                await self._send_analytics(user.id, event_info, processing_time)
-            
-            return result
-            
-        except Exception as e:
-            processing_time = time.time() - start_time
-            
-            # Логируем ошибку
-            self.logger.error(
-                "Bot event processing failed",
-                user_id=user.telegram_id if user else None,
-                event_type=event_info["type"],
+        
+        # Логируем медленные запросы
+        if processing_time > self.slow_threshold:
+            logger.warning(
+                "Slow handler execution",
+                handler=getattr(handler, '__name__', None),
                 processing_time_ms=round(processing_time * 1000, 2),
-                error=str(e),
-                error_type=type(e).__name__,
-                status="error"
+                user_id=user.telegram_id if user else None,
+                threshold_ms=round(self.slow_threshold * 1000, 2)
             )
-            
-            raise
-    
-    def _extract_event_info(self, event: TelegramObject) -> Dict[str, Any]:
-        """Извлечение информации о событии"""
         
-        if isinstance(event, Message):
-            return {
-                "type": "message",
-                "content": event.text[:100] if event.text else f"[{event.content_type}]",
-                "chat_type": event.chat.type if event.chat else None,
-                "chat_id": event.chat.id if event.chat else None,
-                "message_id": event.message_id,
-                "has_media": bool(event.photo or event.document or event.audio or event.video)
-            }
-        
-        elif isinstance(event, CallbackQuery):
-            return {
-                "type": "callback_query",
-                "content": event.data[:100] if event.data else None,
-                "chat_type": event.message.chat.type if event.message and event.message.chat else None,
-                "chat_id": event.message.chat.id if event.message and event.message.chat else None,
-                "message_id": event.message.message_id if event.message else None
-            }
-        
-        elif isinstance(event, InlineQuery):
-            return {
-                "type": "inline_query", 
-                "content": event.query[:100] if event.query else "",
-                "offset": event.offset,
-                "chat_type": "inline"
-            }
+        # Отправляем аналитику в фоне, не задерживая ответ
+        if user:
+            fire_and_forget(
+                self._send_analytics(user.id, event_info, processing_time),
+                name="send_analytics"
+            )
+    
+    def fail(self, trace: EventTrace, error: Exception) -> None:
+        """Обработка завершилась ошибкой: метрика и лог"""
+        user = trace.user
+        processing_time = time.perf_counter() - trace.start_time
+        BOT_ERRORS.inc()
         
-        elif isinstance(event, Update):
-            if event.message:
-                return self._extract_event_info(event.message)
-            elif event.callback_query:
-                return self._extract_event_info(event.callback_query)
-            elif event.inline_query:
-                return self._extract_event_info(event.inline_query)
+        event_info = trace.event_info
+        if event_info is None:
+            event_info = self._extract_event_info(trace.event)
         
-        return {
-            "type": "unknown",
-            "content": str(event)[:100],
-            "chat_type": "unknown"
-        }
+        # Логируем ошибку
+        logger.error(
+            "Bot event processing failed",
+            user_id=user.telegram_id if user else None,
+            event_type=event_info["type"],
+            processing_time_ms=round(processing_time * 1000, 2),
+            error=error,
+            error_type=type(error).__name__,
+            status="error"
+        )
+    
+    def _extract_event_info(self, event: TelegramObject) -> Dict[str, Any]:
+        """Извлечение информации о событии"""
+        return _extract_event_info(event)
     
     async def _send_analytics(self, user_id: int, event_info: Dict[str, Any], processing_time: float) -> None:
         """Отправка данных в аналитику"""
         try:
-            from app.models.analytics import EventType
-            
             # Определяем тип события для аналитики
             event_type_mapping = {
                 "message": EventType.MESSAGE_SENT,
@@ -149,69 +234,17 @@ class LoggingMiddleware(BaseMiddleware):
                     "content": event_info.get("content"),
                     "chat_type": event_info.get("chat_type"),
                     "processing_time_ms": round(processing_time * 1000, 2),
-                    "timestamp": datetime.now(timezone.utc).isoformat()
+                    "timestamp": datetime.now(timezone.utc)
                 }
             )
             
         except Exception as e:
-            self.logger.error(f"Failed to send analytics: {e}")
-
-
-class PerformanceMiddleware(BaseMiddleware):
-    """Middleware для мониторинга производительности"""
-    
-    def __init__(self, slow_threshold: float = 1.0):
-        self.slow_threshold = slow_threshold  # секунды
-        self.logger = get_logger(self.__class__.__name__)
-    
-    async def __call__(
-        self,
-        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
-        event: TelegramObject,
-        data: Dict[str, Any]
-    ) -> Any:
-        """Мониторинг производительности handlers"""
-        
-        start_time = time.time()
-        handler_name = handler.__name__ if hasattr(handler, '__name__') else str(handler)
-        
-        try:
-            result = await handler(event, data)
-            processing_time = time.time() - start_time
-            
-            # Логируем медленные запросы
-            if processing_time > self.slow_threshold:
-                user = data.get("user")
-                self.logger.warning(
-                    "Slow handler execution",
-                    handler=handler_name,
-                    processing_time_ms=round(processing_time * 1000, 2),
-                    user_id=user.telegram_id if user else None,
-                    threshold_ms=round(self.slow_threshold * 1000, 2)
-                )
-            
-            return result
-            
-        except Exception as e:
-            processing_time = time.time() - start_time
-            
-            self.logger.error(
-                "Handler execution failed",
-                handler=handler_name,
-                processing_time_ms=round(processing_time * 1000, 2),
-                error=str(e),
-                error_type=type(e).__name__
-            )
-            
-            raise
+            logger.error("Failed to send analytics: %s", e)
 
 
 class ErrorHandlingMiddleware(BaseMiddleware):
     """Middleware для обработки ошибок"""
     
-    def __init__(self):
-        self.logger = get_logger(self.__class__.__name__)
-    
     async def __call__(
         self,
         handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
@@ -224,12 +257,13 @@ class ErrorHandlingMiddleware(BaseMiddleware):
             return await handler(event, data)
             
         except Exception as e:
-            user = data.get("user")
+            ctx = data.get("ctx")
+            user = ctx.user if ctx else None
             
             # Логируем ошибку
-            self.logger.error(
+            logger.error(
                 "Unhandled error in bot handler",
-                error=str(e),
+                error=e,
                 error_type=type(e).__name__,
                 user_id=user.telegram_id if user else None,
                 handler=handler.__name__ if hasattr(handler, '__name__') else str(handler)
@@ -242,16 +276,11 @@ class ErrorHandlingMiddleware(BaseMiddleware):
     
     async def _send_error_message(self, event: TelegramObject) -> None:
         """Отправка сообщения об ошибке пользователю"""
-        error_message = (
-            "❌ Произошла ошибка при обработке вашего запроса.\n\n"
-            "Попробуйте позже или обратитесь в поддержку: @support"
-        )
-        
         try:
             if isinstance(event, Message):
-                await event.answer(error_message)
+                await event.answer(_ERROR_MESSAGE)
             elif isinstance(event, CallbackQuery):
-                await event.answer(error_message, show_alert=True)
+                await event.answer(_ERROR_MESSAGE, show_alert=True)
         except:
             # Если не удалось отправить сообщение об ошибке, просто игнорируем
             pass
\ No newline at end of file
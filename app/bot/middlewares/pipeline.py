@@ -0,0 +1,80 @@
+"""
+Единый middleware обработки событий бота
+"""
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.core.config import settings
+from app.core.logging import set_request_id
+from app.core.metrics import BOT_UPDATES
+from app.bot.middlewares.auth import AuthMiddleware
+from app.bot.middlewares.throttling import RateLimitMiddleware, ThrottlingMiddleware
+from app.bot.middlewares.logging import LoggingMiddleware
+from app.bot.middlewares.subscription import SubscriptionMiddleware
+
+
+class BotPipelineMiddleware(BaseMiddleware):
+    """Лимит событий, аутентификация, rate limiting, проверка Premium и логирование в одном вызове
+
+    Выполняет шаги отдельных middleware напрямую, без цепочки оберток aiogram:
+    одна корутина и один try вокруг обработчика на событие
+    """
+    
+    def __init__(self, slow_threshold: float = 1.0):
+        self.rate_limit = RateLimitMiddleware()
+        self.auth = AuthMiddleware()
+        # Флуд сообщениями проверяется тем же запросом к Redis, что и rate limit
+        self.throttling = ThrottlingMiddleware(
+            flood_limit=settings.FLOOD_LIMIT,
+            flood_window=settings.FLOOD_WINDOW
+        )
+        self.subscription = SubscriptionMiddleware()
+        self.logging = LoggingMiddleware(slow_threshold)
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        """Последовательная обработка события"""
+        BOT_UPDATES.inc()
+        
+        # update_id - идентификатор запроса во всех логах обработки события
+        update = data.get("event_update")
+        if update is not None:
+            set_request_id(str(update.update_id))
+        
+        # Отсев флуда до обращений к БД
+        if not await self.rate_limit.allow(data):
+            return
+        
+        # Аутентификация и данные пользователя
+        if not await self.auth.authenticate(event, data):
+            return
+        
+        # Rate limiting
+        allowed, action_type = await self.throttling.acquire(event, data)
+        if not allowed:
+            return
+        
+        # Проверка Premium доступа
+        if not await self.subscription.check_access(event, data):
+            return
+        
+        # ORM объекты (user, subscription) - только для обработчиков, которым они нужны
+        await self.auth.load_handler_args(data)
+        
+        trace = self.logging.start(event, data)
+        try:
+            result = await handler(event, data)
+        except Exception as e:
+            self.logging.fail(trace, e)
+            if action_type:
+                await self.throttling.release(data["ctx"].user.telegram_id, e)
+            raise
+        
+        self.logging.finish(trace, handler)
+        return result
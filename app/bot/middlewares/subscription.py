@@ -1,8 +1,8 @@
 """
 Middleware для проверки подписки и Premium функций
 """
-from typing import Any, Awaitable, Callable, Dict, Set
-from datetime import datetime, timezone
+import time
+from typing import Any, Awaitable, Callable, Dict, FrozenSet
 
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, Message, CallbackQuery
@@ -10,31 +10,65 @@ from aiogram.filters import Command
 
 from app.core.logging import get_logger
 from app.services.user_service import user_service
+from app.bot.keyboards.inline import (
+    get_premium_keyboard,
+    get_premium_offer_keyboard,
+    get_renew_subscription_keyboard
+)
+
+# Сообщение о функции, доступной только с Premium
+_PREMIUM_REQUIRED_MESSAGE = (
+    "💎 **Premium функция**\n\n"
+    "Эта функция доступна только для Premium подписчиков.\n\n"
+    "**Premium преимущества:**\n"
+    "• Безлимитные скачивания\n"
+    "• Высокое качество (320kbps)\n"
+    "• Приоритетный поиск\n"
+    "• Расширенная статистика\n"
+    "• Без рекламы\n"
+    "• Экспорт плейлистов\n\n"
+    "💳 **Цены:**\n"
+    "• 1 месяц - ⭐ 150 Stars\n"
+    "• 3 месяца - ⭐ 400 Stars (-12%)\n"
+    "• 1 год - ⭐ 1400 Stars (-23%)"
+)
+
+# Сообщение об истекшей подписке
+_SUBSCRIPTION_EXPIRED_MESSAGE = (
+    "⏰ **Подписка истекла**\n\n"
+    "Ваша Premium подписка закончилась.\n"
+    "Продлите подписку, чтобы продолжить пользоваться Premium функциями.\n\n"
+    "💳 **Продлить подписку:**"
+)
+
+logger = get_logger(__name__)
 
 
 class SubscriptionMiddleware(BaseMiddleware):
     """Middleware для проверки Premium подписки"""
     
     def __init__(self):
-        self.logger = get_logger(self.__class__.__name__)
-        
         # Команды и действия, требующие Premium подписку
-        self.premium_commands: Set[str] = {
+        self.premium_commands: FrozenSet[str] = frozenset({
             "/premium_search",
             "/high_quality", 
             "/unlimited_downloads",
             "/export_playlist",
             "/advanced_stats"
-        }
+        })
         
         # Callback данные, требующие Premium
-        self.premium_callbacks: Set[str] = {
+        self.premium_callbacks: FrozenSet[str] = frozenset({
             "download_320kbps",
             "export_playlist",
             "advanced_search",
             "batch_download",
             "smart_recommendations"
-        }
+        })
+        
+        # Короткие префиксы для быстрого отсева обычных событий без split()
+        self._command_prefixes = tuple({c[:4] for c in self.premium_commands})
+        self._callback_prefixes = tuple({c[:4] for c in self.premium_callbacks})
     
     async def __call__(
         self,
@@ -43,130 +77,108 @@ class SubscriptionMiddleware(BaseMiddleware):
         data: Dict[str, Any]
     ) -> Any:
         """Проверка доступа к Premium функциям"""
+        # Premium-действия бывают только у сообщений и callback
+        if not isinstance(event, (Message, CallbackQuery)):
+            return await handler(event, data)
+        if not await self.check_access(event, data):
+            return
+        return await handler(event, data)
+    
+    async def check_access(self, event: TelegramObject, data: Dict[str, Any]) -> bool:
+        """Проверка Premium доступа; False - событие не обрабатывается дальше"""
         
         # Проверяем, нужна ли Premium подписка для этого действия
-        requires_premium = self._requires_premium(event)
-        
-        if not requires_premium:
-            return await handler(event, data)
+        if not self._requires_premium(event):
+            return True
         
         # Получаем пользователя
-        user = data.get("user")
-        is_premium = data.get("is_premium", False)
+        ctx = data["ctx"]
+        user = ctx.user
         
         if not user:
-            return await handler(event, data)
+            return True
         
         # Проверяем Premium статус
-        if not is_premium:
+        if not ctx.is_premium:
             await self._handle_premium_required(event, user.telegram_id)
-            return
+            return False
         
         # Проверяем срок подписки
-        subscription = data.get("subscription")
-        if subscription and subscription.expires_at <= datetime.now(timezone.utc):
+        expires_ts = ctx.subscription_expires_ts
+        if expires_ts is not None and expires_ts <= time.time():
             await self._handle_subscription_expired(event, user.telegram_id)
-            return
+            return False
         
-        return await handler(event, data)
+        return True
     
     def _requires_premium(self, event: TelegramObject) -> bool:
         """Проверка, требует ли действие Premium подписку"""
         
         if isinstance(event, Message):
-            if event.text:
-                # Проверяем команды
-                command = event.text.split()[0] if event.text.startswith('/') else None
-                if command in self.premium_commands:
-                    return True
-        
-        elif isinstance(event, CallbackQuery):
-            if event.data:
-                # Проверяем callback данные
-                callback_action = event.data.split(':')[0] if ':' in event.data else event.data
-                if callback_action in self.premium_callbacks:
-                    return True
+            text = event.text
+            # Проверяем команды
+            if not text or not text.startswith(self._command_prefixes):
+                return False
+            return text.split(maxsplit=1)[0] in self.premium_commands
+        
+        if isinstance(event, CallbackQuery):
+            callback_data = event.data
+            # Проверяем callback данные
+            if not callback_data or not callback_data.startswith(self._callback_prefixes):
+                return False
+            return callback_data.partition(':')[0] in self.premium_callbacks
         
         return False
     
     async def _handle_premium_required(self, event: TelegramObject, user_id: int) -> None:
         """Обработка запроса Premium функции без подписки"""
         
-        premium_message = (
-            "💎 **Premium функция**\n\n"
-            "Эта функция доступна только для Premium подписчиков.\n\n"
-            "**Premium преимущества:**\n"
-            "• Безлимитные скачивания\n"
-            "• Высокое качество (320kbps)\n"
-            "• Приоритетный поиск\n"
-            "• Расширенная статистика\n"
-            "• Без рекламы\n"
-            "• Экспорт плейлистов\n\n"
-            "💳 **Цены:**\n"
-            "• 1 месяц - ⭐ 150 Stars\n"
-            "• 3 месяца - ⭐ 400 Stars (-12%)\n"
-            "• 1 год - ⭐ 1400 Stars (-23%)"
-        )
-        
-        from app.bot.keyboards.inline import get_premium_keyboard
-        
         try:
             if isinstance(event, Message):
                 await event.answer(
-                    premium_message,
+                    _PREMIUM_REQUIRED_MESSAGE,
                     reply_markup=get_premium_keyboard(),
                     parse_mode="Markdown"
                 )
             elif isinstance(event, CallbackQuery):
                 await event.message.edit_text(
-                    premium_message,
+                    _PREMIUM_REQUIRED_MESSAGE,
                     reply_markup=get_premium_keyboard(),
                     parse_mode="Markdown"
                 )
         except Exception as e:
-            self.logger.error(f"Failed to send premium required message: {e}")
+            logger.error("Failed to send premium required message: %s", e)
     
     async def _handle_subscription_expired(self, event: TelegramObject, user_id: int) -> None:
         """Обработка истекшей подписки"""
         
-        expired_message = (
-            "⏰ **Подписка истекла**\n\n"
-            "Ваша Premium подписка закончилась.\n"
-            "Продлите подписку, чтобы продолжить пользоваться Premium функциями.\n\n"
-            "💳 **Продлить подписку:**"
-        )
-        
-        from app.bot.keyboards.inline import get_renew_subscription_keyboard
-        
         try:
             if isinstance(event, Message):
                 await event.answer(
-                    expired_message,
+                    _SUBSCRIPTION_EXPIRED_MESSAGE,
                     reply_markup=get_renew_subscription_keyboard(),
                     parse_mode="Markdown"
                 )
             elif isinstance(event, CallbackQuery):
                 await event.message.edit_text(
-                    expired_message,
+                    _SUBSCRIPTION_EXPIRED_MESSAGE,
                     reply_markup=get_renew_subscription_keyboard(),
                     parse_mode="Markdown"
                 )
         except Exception as e:
-            self.logger.error(f"Failed to send subscription expired message: {e}")
+            logger.error("Failed to send subscription expired message: %s", e)
 
 
 class DownloadLimitsMiddleware(BaseMiddleware):
     """Middleware для проверки лимитов скачивания"""
     
     def __init__(self):
-        self.logger = get_logger(self.__class__.__name__)
-        
         # Действия, которые считаются скачиванием
-        self.download_actions: Set[str] = {
+        self.download_actions: FrozenSet[str] = frozenset({
             "download",
             "get_track",
             "download_track"
-        }
+        })
     
     async def __call__(
         self,
@@ -176,16 +188,17 @@ class DownloadLimitsMiddleware(BaseMiddleware):
     ) -> Any:
         """Проверка лимитов скачивания"""
         
-        # Проверяем, является ли это действие скачиванием
-        is_download = self._is_download_action(event)
+        # Скачивание возможно только из callback: сообщения пропускаем сразу
+        if not isinstance(event, CallbackQuery) or not event.data:
+            return await handler(event, data)
         
-        if not is_download:
+        if event.data.partition(':')[0] not in self.download_actions:
             return await handler(event, data)
         
-        user = data.get("user")
-        user_limits = data.get("user_limits")
+        ctx = data["ctx"]
+        user_limits = ctx.user_limits
         
-        if not user or not user_limits:
+        if not ctx.user or not user_limits:
             return await handler(event, data)
         
         # Проверяем лимиты
@@ -195,15 +208,6 @@ class DownloadLimitsMiddleware(BaseMiddleware):
         
         return await handler(event, data)
     
-    def _is_download_action(self, event: TelegramObject) -> bool:
-        """Проверка, является ли действие скачиванием"""
-        
-        if isinstance(event, CallbackQuery) and event.data:
-            action = event.data.split(':')[0] if ':' in event.data else event.data
-            return action in self.download_actions
-        
-        return False
-    
     async def _handle_download_limit_exceeded(self, event: TelegramObject, user_limits: Dict[str, Any]) -> None:
         """Обработка превышения лимита скачиваний"""
         
@@ -234,7 +238,6 @@ class DownloadLimitsMiddleware(BaseMiddleware):
             if isinstance(event, CallbackQuery):
                 keyboard = None
                 if not is_premium:
-                    from app.bot.keyboards.inline import get_premium_offer_keyboard
                     keyboard = get_premium_offer_keyboard()
                 
                 await event.answer(limit_message, show_alert=True)
@@ -249,4 +252,4 @@ class DownloadLimitsMiddleware(BaseMiddleware):
                         pass
                         
         except Exception as e:
-            self.logger.error(f"Failed to send download limit message: {e}")
\ No newline at end of file
+            logger.error("Failed to send download limit message: %s", e)
\ No newline at end of file
@@ -1,12 +1,16 @@
 """
 Middleware для ограничения частоты запросов (rate limiting)
 """
+import re
 import time
+import uuid
 import asyncio
-from typing import Any, Awaitable, Callable, Dict, Optional
-from datetime import datetime, timezone, timedelta
+from collections import deque
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
 
 from aiogram import BaseMiddleware
+from cachetools import TTLCache
 from aiogram.types import TelegramObject, Message, CallbackQuery, InlineQuery
 from aiogram.exceptions import TelegramTooManyRequests
 
@@ -14,20 +18,209 @@ from app.core.logging import get_logger, security_logger
 from app.services.cache_service import user_cache
 from app.core.config import settings
 
+logger = get_logger(__name__)
+
+# Token bucket в хеше {t: токены, ts: время пополнения}: проверка и списание токена
+# атомарно, за один RTT, память O(1) на пользователя и действие.
+# Если передан KEYS[2], в том же вызове проверяется антифлуд сообщений:
+# счетчик в фиксированном окне, при флуде токен не списывается.
+# ARGV: сейчас (мс), емкость, пополнение в секунду, TTL ключа (мс),
+# лимит флуда, окно флуда (мс).
+# Возвращает {разрешено, осталось токенов, мс до следующего токена, счетчик флуда}
+_TOKEN_BUCKET_LUA = """
+if KEYS[2] then
+    local fc = redis.call('INCR', KEYS[2])
+    if fc == 1 then
+        redis.call('PEXPIRE', KEYS[2], ARGV[6])
+    end
+    if fc > tonumber(ARGV[5]) then
+        return {0, 0, redis.call('PTTL', KEYS[2]), fc}
+    end
+end
+local now = tonumber(ARGV[1])
+local cap = tonumber(ARGV[2])
+local rate = tonumber(ARGV[3])
+local h = redis.call('HMGET', KEYS[1], 't', 'ts')
+local tokens = tonumber(h[1]) or cap
+local ts = tonumber(h[2]) or now
+tokens = math.min(cap, tokens + (now - ts) / 1000 * rate)
+if tokens >= 1 then
+    tokens = tokens - 1
+    redis.call('HSET', KEYS[1], 't', tokens, 'ts', now)
+    redis.call('PEXPIRE', KEYS[1], ARGV[4])
+    return {1, math.floor(tokens), 0, 0}
+end
+return {0, 0, math.ceil((1 - tokens) / rate * 1000), 0}
+"""
+
+# (емкость, пополнение в секунду) для действий без своих лимитов
+_DEFAULT_ACTION_CFG = (10, 10 / 60)
+
+# Названия действий для сообщения о превышении лимита
+_ACTION_NAMES = MappingProxyType({
+    "message": "сообщений",
+    "callback": "нажатий кнопок",
+    "inline": "inline запросов",
+    "search": "поисковых запросов",
+    "download": "скачиваний"
+})
+
+# Сообщение о превышении лимита; подставляются действие и время до сброса
+_LIMIT_TEMPLATE = (
+    "⏰ Слишком много %s!\n\n"
+    "Попробуйте снова через %s\n\n"
+    "💎 Premium пользователи имеют увеличенные лимиты"
+)
+
+# Антифлуд: отметки сообщений в sorted set, очистка окна, подсчет и запись атомарно.
+# KEYS: отметки, флаг отправленного предупреждения.
+# ARGV: сейчас (мс), окно (мс), лимит, уникальный id сообщения.
+# Возвращает {разрешено, сообщений в окне, нужно ли предупредить};
+# предупреждение - не чаще раза в 30 секунд
+_FLOOD_LUA = """
+local now = tonumber(ARGV[1])
+local win = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now - win)
+local c = redis.call('ZCARD', KEYS[1])
+if c >= tonumber(ARGV[3]) then
+    local warn = redis.call('SET', KEYS[2], 1, 'NX', 'EX', 30)
+    return {0, c, warn and 1 or 0}
+end
+redis.call('ZADD', KEYS[1], now, ARGV[4])
+redis.call('PEXPIRE', KEYS[1], win * 2)
+return {1, c + 1, 0}
+"""
+
+# Отказы rate limit за последние 100 мс по (user_id, тип действия).
+# Bucket не пополнится за это время, поэтому серия нажатий после отказа
+# обслуживается локально, без запросов к Redis. Обращения к кешу не прерываются
+# await, так что в одном event loop блокировка не нужна
+_recent_denials: TTLCache = TTLCache(maxsize=10_000, ttl=0.1)
+
+_FLOOD_MESSAGE = (
+    "🛑 Обнаружен флуд!\n\n"
+    "Пожалуйста, не отправляйте сообщения слишком часто."
+)
+
+
+# Префиксы callback data поиска и скачивания: одно совпадение regex вместо
+# нескольких startswith, группа - ключ в таблице типов действий
+_CALLBACK_PREFIX_RE = re.compile(r"(search|st|find|download|get):")
+_PREFIX_ACTIONS = MappingProxyType({
+    "search": "search",
+    "st": "search",
+    "find": "search",
+    "download": "download",
+    "get": "download"
+})
+
+
+def _callback_action(event: CallbackQuery) -> Optional[str]:
+    """Тип действия для callback"""
+    if not event.data:
+        return None
+    match = _CALLBACK_PREFIX_RE.match(event.data)
+    return _PREFIX_ACTIONS[match.group(1)] if match else "callback"
+
+
+def _message_action(event: Message) -> str:
+    """Тип действия для сообщения: поисковый запрос (не команда) или сообщение"""
+    text = event.text
+    # Команды и сообщения без текста - самый частый случай, отвечаем сразу
+    if not text or text[0] == "/":
+        return "message"
+    return "search" if len(text) > 2 else "message"
+
+
+def _inline_action(event: InlineQuery) -> str:
+    """Тип действия для inline запроса"""
+    return "inline"
+
+
+# Диспетчеризация по точному типу события вместо цепочки isinstance
+_ACTION_GETTERS: Dict[type, Callable[[Any], Optional[str]]] = {
+    CallbackQuery: _callback_action,
+    Message: _message_action,
+    InlineQuery: _inline_action,
+}
+
+
+class RateLimitMiddleware(BaseMiddleware):
+    """Грубый лимит событий на пользователя, выполняется до аутентификации
+
+    Один счетчик INCR в Redis на пользователя: флудер отсекается
+    без обращений к БД и сервисам
+    """
+    
+    def __init__(self, limit: int = settings.USER_EVENTS_RATE_LIMIT, window: int = 60):
+        self.limit = limit
+        self.window = window
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        """Отбрасывание событий сверх лимита"""
+        if not await self.allow(data):
+            return
+        return await handler(event, data)
+    
+    async def allow(self, data: Dict[str, Any]) -> bool:
+        """Учет события; False - лимит превышен и событие отбрасывается"""
+        tg_user = data.get("event_from_user")
+        redis = user_cache.redis
+        if not tg_user or redis is None:
+            return True
+        
+        key = f"user:rl:{tg_user.id}"
+        try:
+            # Окно фиксировано от первого события: SET NX не продлевает TTL,
+            # иначе у активного пользователя счетчик никогда не сбрасывался бы
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.set(key, 0, ex=self.window, nx=True)
+                pipe.incr(key)
+                _, count = await pipe.execute()
+        except Exception as e:
+            # Без Redis не блокируем пользователей
+            logger.warning("Rate limit check failed for user %s: %s", tg_user.id, e)
+            return True
+        
+        if count > self.limit:
+            if count == self.limit + 1:
+                logger.warning("User %s exceeded %s events per %ss", tg_user.id, self.limit, self.window)
+            return False
+        return True
+
 
 class ThrottlingMiddleware(BaseMiddleware):
-    """Middleware для контроля частоты запросов"""
+    """Middleware для контроля частоты запросов
+
+    С flood_limit > 0 заодно проверяет флуд сообщениями тем же запросом
+    к Redis, что и rate limit, вместо отдельного AntiFloodMiddleware
+    """
     
-    def __init__(self):
-        self.logger = get_logger(self.__class__.__name__)
+    def __init__(self, flood_limit: int = 0, flood_window: int = 10):
+        self.flood_limit = flood_limit
+        self.flood_window = flood_window
+        
+        # Lua-скрипт rate limit, регистрируется при первой проверке
+        self._script = None
         
         # Лимиты для разных типов действий
         self.rate_limits = {
-            "message": {"limit": 30, "window": 60},      # 30 сообщений в минуту
-            "callback": {"limit": 50, "window": 60},     # 50 коллбеков в минуту
-            "inline": {"limit": 100, "window": 60},      # 100 inline запросов в минуту
-            "search": {"limit": 20, "window": 60},       # 20 поисков в минуту
-            "download": {"limit": 10, "window": 60},     # 10 скачиваний в минуту
+            "message": {"capacity": 30, "refill_per_sec": 30 / 60},      # 30 сообщений в минуту
+            "callback": {"capacity": 50, "refill_per_sec": 50 / 60},     # 50 коллбеков в минуту
+            "inline": {"capacity": 100, "refill_per_sec": 100 / 60},     # 100 inline запросов в минуту
+            "search": {"capacity": 20, "refill_per_sec": 20 / 60},       # 20 поисков в минуту
+            "download": {"capacity": 10, "refill_per_sec": 10 / 60},     # 10 скачиваний в минуту
+        }
+        
+        # (емкость, пополнение в секунду) по типу действия: один поиск в dict на проверку
+        self._action_cfg: Dict[str, Tuple[int, float]] = {
+            action: (cfg["capacity"], cfg["refill_per_sec"])
+            for action, cfg in self.rate_limits.items()
         }
     
     async def __call__(
@@ -37,152 +230,157 @@ class ThrottlingMiddleware(BaseMiddleware):
         data: Dict[str, Any]
     ) -> Any:
         """Основной метод middleware"""
+        allowed, action_type = await self.acquire(event, data)
+        if not allowed:
+            return
+        if not action_type:
+            return await handler(event, data)
         
-        user = data.get("user")
-        if not user:
+        try:
             return await handler(event, data)
+        except Exception as e:
+            await self.release(data["ctx"].user.telegram_id, e)
+            raise
+    
+    async def acquire(
+        self,
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Tuple[bool, Optional[str]]:
+        """Проверка rate limit перед обработчиком
+
+        Возвращает (разрешено, тип действия); тип None - действие не лимитируется
+        """
+        ctx = data["ctx"]
+        user = ctx.user
+        if not user:
+            return True, None
         
         # Определяем тип действия
         action_type = self._get_action_type(event, data)
         if not action_type:
-            return await handler(event, data)
+            return True, None
         
-        # Проверяем rate limit
-        is_allowed, remaining, reset_time = await self._check_rate_limit(
+        # Проверяем rate limit (и флуд для сообщений).
+        # Premium статус берется из контекста - он пришел вместе с кешированными
+        # данными пользователя, отдельного запроса к Redis за ним нет
+        is_allowed, remaining, retry_ms, flood_count = await self._check_rate_limit(
             user.telegram_id, 
             action_type,
-            data.get("is_premium", False)
+            ctx.is_premium,
+            check_flood=self.flood_limit > 0 and isinstance(event, Message)
         )
         
+        if flood_count:
+            # Предупреждаем один раз за окно - на первом сообщении сверх лимита
+            if flood_count == self.flood_limit + 1:
+                await self._handle_flood(event, user.telegram_id, flood_count)
+            return False, action_type
+        
         if not is_allowed:
             await self._handle_rate_limit_exceeded(
                 event, 
                 user.telegram_id, 
                 action_type,
                 remaining, 
-                reset_time
+                retry_ms
             )
-            return
+            return False, action_type
         
         # Добавляем информацию о лимитах в данные
         data["rate_limit_remaining"] = remaining
-        data["rate_limit_reset"] = reset_time
-        
-        try:
-            result = await handler(event, data)
-            
-            # Записываем успешное действие
-            await self._record_action(user.telegram_id, action_type)
-            
-            return result
-            
-        except TelegramTooManyRequests as e:
+        data["rate_limit_retry_ms"] = retry_ms
+        return True, action_type
+    
+    async def release(self, user_id: int, error: BaseException) -> None:
+        """Обработка ошибки обработчика
+
+        Действие уже учтено скриптом при проверке лимита (в том числе
+        при ошибке обработчика), здесь обрабатывается только rate limit Telegram API
+        """
+        if isinstance(error, TelegramTooManyRequests):
             # Telegram API rate limit
-            self.logger.warning(f"Telegram API rate limit for user {user.telegram_id}: {e}")
-            await asyncio.sleep(e.retry_after or 1)
-            raise
-        except Exception:
-            # Записываем действие даже при ошибке (для предотвращения спама)
-            await self._record_action(user.telegram_id, action_type)
-            raise
+            logger.warning("Telegram API rate limit for user %s: %s", user_id, error)
+            await asyncio.sleep(error.retry_after or 1)
     
     def _get_action_type(self, event: TelegramObject, data: Dict[str, Any]) -> Optional[str]:
         """Определение типа действия для rate limiting"""
-        
-        # Проверяем специальные действия по callback data или тексту
-        if isinstance(event, CallbackQuery):
-            if event.data:
-                if event.data.startswith("search:") or event.data.startswith("find:"):
-                    return "search"
-                elif event.data.startswith("download:") or event.data.startswith("get:"):
-                    return "download"
-                return "callback"
-        
-        elif isinstance(event, Message):
-            if event.text:
-                # Поисковые запросы (не команды)
-                if not event.text.startswith("/") and len(event.text) > 2:
-                    return "search"
-            return "message"
-        
-        elif isinstance(event, InlineQuery):
-            return "inline"
-        
-        return None
+        get_action = _ACTION_GETTERS.get(type(event))
+        return get_action(event) if get_action else None
     
     async def _check_rate_limit(
         self, 
         user_id: int, 
         action_type: str, 
-        is_premium: bool
-    ) -> tuple[bool, int, datetime]:
-        """Проверка rate limit для пользователя"""
+        is_premium: bool,
+        check_flood: bool = False
+    ) -> tuple[bool, int, int, int]:
+        """Проверка rate limit для пользователя
+
+        Возвращает (разрешено, осталось, мс до следующего токена, счетчик флуда).
+        Для разрешенного действия токен списывается тем же скриптом;
+        счетчик флуда равен 0, если флуда нет
+        """
+        
+        # Недавний отказ в этом процессе: повторные нажатия отвечаем без Redis
+        denied_key = (user_id, action_type)
+        retry_ms = _recent_denials.get(denied_key)
+        if retry_ms is not None:
+            return False, 0, retry_ms, 0
         
         # Получаем лимиты для типа действия
-        base_limits = self.rate_limits.get(action_type, {"limit": 10, "window": 60})
+        capacity, refill = self._action_cfg.get(action_type, _DEFAULT_ACTION_CFG)
         
-        # Увеличиваем лимиты для premium пользователей
+        # Premium пользователи получают вдвое больший и быстрее пополняемый bucket
         if is_premium:
-            limit = int(base_limits["limit"] * 2)
-        else:
-            limit = base_limits["limit"]
+            capacity *= 2
+            refill *= 2
         
-        window = base_limits["window"]
+        # Время полного пополнения bucket: дальше ключ не нужен
+        full_ms = int(capacity / refill * 1000)
         
-        # Ключ для кеша
-        cache_key = f"rate_limit:{user_id}:{action_type}"
+        redis = user_cache.redis
+        if redis is None:
+            # Без Redis лимиты не применяются
+            return True, capacity - 1, 0, 0
         
-        # Получаем текущие данные из кеша
-        current_data = await user_cache.get(cache_key, "rate_limit")
+        # Скрипт регистрируется один раз на клиент; evalsha с повторной загрузкой при NOSCRIPT
+        if self._script is None or self._script.registered_client is not redis:
+            self._script = redis.register_script(_TOKEN_BUCKET_LUA)
         
-        now = time.time()
-        reset_time = datetime.now(timezone.utc) + timedelta(seconds=window)
+        keys = [f"tb:{user_id}:{action_type}"]
+        if check_flood:
+            keys.append(f"flood:n:{user_id}")
         
-        if not current_data:
-            # Первый запрос
-            await user_cache.set(
-                cache_key, 
-                {"count": 0, "window_start": now},
-                ttl=window,
-                cache_type="rate_limit"
-            )
-            return True, limit - 1, reset_time
-        
-        window_start = current_data.get("window_start", now)
-        count = current_data.get("count", 0)
-        
-        # Проверяем, не истекло ли окно
-        if now - window_start > window:
-            # Новое окно
-            await user_cache.set(
-                cache_key,
-                {"count": 0, "window_start": now},
-                ttl=window,
-                cache_type="rate_limit"
+        try:
+            allowed, remaining, retry_ms, flood_count = await self._script(
+                keys=keys,
+                args=[
+                    time.time_ns() // 1_000_000, capacity, refill, full_ms,
+                    self.flood_limit, self.flood_window * 1000
+                ]
             )
-            return True, limit - 1, reset_time
+        except Exception as e:
+            logger.warning("Rate limit check failed for user %s: %s", user_id, e)
+            return True, capacity - 1, 0, 0
         
-        # Проверяем лимит
-        if count >= limit:
-            remaining_time = window - (now - window_start)
-            reset_time = datetime.now(timezone.utc) + timedelta(seconds=remaining_time)
-            return False, 0, reset_time
+        if not allowed and not flood_count:
+            _recent_denials[denied_key] = retry_ms
         
-        return True, limit - count - 1, reset_time
+        return bool(allowed), remaining, retry_ms, flood_count
     
-    async def _record_action(self, user_id: int, action_type: str) -> None:
-        """Запись выполненного действия"""
-        cache_key = f"rate_limit:{user_id}:{action_type}"
-        
-        current_data = await user_cache.get(cache_key, "rate_limit")
-        if current_data:
-            current_data["count"] = current_data.get("count", 0) + 1
-            await user_cache.set(
-                cache_key,
-                current_data,
-                ttl=self.rate_limits.get(action_type, {}).get("window", 60),
-                cache_type="rate_limit"
-            )
+    async def _handle_flood(self, event: Message, user_id: int, count: int) -> None:
+        """Предупреждение о флуде"""
+        try:
+            await event.answer(_FLOOD_MESSAGE)
+        except Exception:
+            pass
+        
+        await security_logger.log_suspicious_activity(
+            user_id=user_id,
+            activity_type="flood",
+            details=f"{count} messages in {self.flood_window}s"
+        )
     
     async def _handle_rate_limit_exceeded(
         self,
@@ -190,7 +388,7 @@ class ThrottlingMiddleware(BaseMiddleware):
         user_id: int,
         action_type: str,
         remaining: int,
-        reset_time: datetime
+        retry_ms: int
     ) -> None:
         """Обработка превышения rate limit"""
         
@@ -199,35 +397,21 @@ class ThrottlingMiddleware(BaseMiddleware):
             user_id=user_id,
             limit_type=action_type,
             current_count=0,  # Мы не знаем точное количество здесь
-            limit=self.rate_limits.get(action_type, {}).get("limit", 0)
+            limit=self._action_cfg.get(action_type, _DEFAULT_ACTION_CFG)[0]
         )
         
         # Формируем сообщение пользователю
-        action_names = {
-            "message": "сообщений",
-            "callback": "нажатий кнопок", 
-            "inline": "inline запросов",
-            "search": "поисковых запросов",
-            "download": "скачиваний"
-        }
-        
-        action_name = action_names.get(action_type, "действий")
+        action_name = _ACTION_NAMES.get(action_type, "действий")
         
-        # Время до сброса лимита
-        time_left = reset_time - datetime.now(timezone.utc)
-        minutes_left = int(time_left.total_seconds() // 60)
-        seconds_left = int(time_left.total_seconds() % 60)
+        # Время до сброса лимита, с округлением вверх до секунды
+        minutes_left, seconds_left = divmod(-(-retry_ms // 1000), 60)
         
         if minutes_left > 0:
             time_str = f"{minutes_left} мин {seconds_left} сек"
         else:
             time_str = f"{seconds_left} сек"
         
-        limit_message = (
-            f"⏰ Слишком много {action_name}!\n\n"
-            f"Попробуйте снова через {time_str}\n\n"
-            f"💎 Premium пользователи имеют увеличенные лимиты"
-        )
+        limit_message = _LIMIT_TEMPLATE % (action_name, time_str)
         
         # Отправляем сообщение
         if isinstance(event, Message):
@@ -243,12 +427,27 @@ class ThrottlingMiddleware(BaseMiddleware):
 
 
 class AntiFloodMiddleware(BaseMiddleware):
-    """Простая защита от флуда сообщениями"""
+    """Простая защита от флуда сообщениями
+
+    Вместе с rate limit лучше использовать ThrottlingMiddleware(flood_limit=...):
+    обе проверки выполняются одним запросом к Redis.
+    С local=True (один процесс бота) отметки хранятся в памяти процесса
+    в кольцевых буферах, без Redis
+    """
     
-    def __init__(self, flood_limit: int = 5, flood_window: int = 10):
+    def __init__(self, flood_limit: int = 5, flood_window: int = 10, local: bool = False):
         self.flood_limit = flood_limit
         self.flood_window = flood_window
-        self.logger = get_logger(self.__class__.__name__)
+        self.local = local
+        
+        # Lua-скрипт антифлуда, регистрируется при первой проверке
+        self._script = None
+        
+        # Локальный режим: последние flood_limit + 1 отметок на пользователя.
+        # Запись обновляется на каждом сообщении, молчащие пользователи вытесняются по TTL
+        self._user_times: TTLCache = TTLCache(maxsize=100_000, ttl=flood_window)
+        # Пользователи, предупрежденные за последние 30 секунд
+        self._warned: TTLCache = TTLCache(maxsize=100_000, ttl=30)
     
     async def __call__(
         self,
@@ -261,40 +460,24 @@ class AntiFloodMiddleware(BaseMiddleware):
         if not isinstance(event, Message):
             return await handler(event, data)
         
-        user = data.get("user")
+        ctx = data.get("ctx")
+        user = ctx.user if ctx else None
         if not user:
             return await handler(event, data)
         
         # Проверяем флуд
-        cache_key = f"flood:{user.telegram_id}"
-        flood_data = await user_cache.get(cache_key, "antiflood")
-        
-        now = time.time()
-        
-        if not flood_data:
-            flood_data = {"messages": [], "last_flood_time": 0}
-        
-        # Очищаем старые сообщения
-        flood_data["messages"] = [
-            msg_time for msg_time in flood_data["messages"]
-            if now - msg_time < self.flood_window
-        ]
-        
-        # Добавляем текущее сообщение
-        flood_data["messages"].append(now)
+        if self.local:
+            allowed, count, warn = self._check_local(user.telegram_id)
+        else:
+            result = await self._check_redis(user.telegram_id)
+            if result is None:
+                return await handler(event, data)
+            allowed, count, warn = result
         
-        # Проверяем превышение лимита
-        if len(flood_data["messages"]) > self.flood_limit:
-            # Проверяем, когда последний раз отправляли предупреждение
-            if now - flood_data.get("last_flood_time", 0) > 30:  # Не чаще раза в 30 сек
-                flood_data["last_flood_time"] = now
-                await user_cache.set(cache_key, flood_data, ttl=300, cache_type="antiflood")
-                
+        if not allowed:
+            if warn:
                 try:
-                    await event.answer(
-                        "🛑 Обнаружен флуд!\n\n"
-                        "Пожалуйста, не отправляйте сообщения слишком часто."
-                    )
+                    await event.answer(_FLOOD_MESSAGE)
                 except:
                     pass
                 
@@ -302,12 +485,50 @@ class AntiFloodMiddleware(BaseMiddleware):
                 await security_logger.log_suspicious_activity(
                     user_id=user.telegram_id,
                     activity_type="flood",
-                    details=f"{len(flood_data['messages'])} messages in {self.flood_window}s"
+                    details=f"{count} messages in {self.flood_window}s"
                 )
             
             return  # Блокируем обработку сообщения
         
-        # Сохраняем данные
-        await user_cache.set(cache_key, flood_data, ttl=300, cache_type="antiflood")
+        return await handler(event, data)
+    
+    def _check_local(self, user_id: int) -> Tuple[bool, int, bool]:
+        """Проверка по кольцевому буферу в памяти процесса"""
+        now = time.monotonic()
+        times = self._user_times.get(user_id)
+        if times is None:
+            times = deque(maxlen=self.flood_limit + 1)
+        times.append(now)
+        self._user_times[user_id] = times
+        
+        # Буфер заполнен, и самая старая отметка еще в окне - флуд
+        if len(times) == times.maxlen and now - times[0] < self.flood_window:
+            warn = user_id not in self._warned
+            if warn:
+                self._warned[user_id] = None
+            return False, len(times), warn
+        return True, len(times), False
+    
+    async def _check_redis(self, user_id: int) -> Optional[Tuple[bool, int, bool]]:
+        """Проверка по sorted set в Redis; None - Redis недоступен"""
+        redis = user_cache.redis
+        if redis is None:
+            return None
+        
+        # Скрипт регистрируется один раз на клиент; evalsha с повторной загрузкой при NOSCRIPT
+        if self._script is None or self._script.registered_client is not redis:
+            self._script = redis.register_script(_FLOOD_LUA)
+        
+        try:
+            allowed, count, warn = await self._script(
+                keys=[f"flood:{user_id}", f"flood:warned:{user_id}"],
+                args=[
+                    time.time_ns() // 1_000_000, self.flood_window * 1000,
+                    self.flood_limit, uuid.uuid4().hex
+                ]
+            )
+        except Exception as e:
+            logger.warning("Flood check failed for user %s: %s", user_id, e)
+            return None
         
-        return await handler(event, data)
\ No newline at end of file
+        return bool(allowed), count, bool(warn)
@@ -0,0 +1,86 @@
+"""
+Компактное кодирование callback_data для кнопок треков и поиска
+"""
+import secrets
+from typing import List, Optional, Tuple
+
+from cachetools import TTLCache
+
+from app.models.track import TrackSource
+
+CALLBACK_SEPARATOR = ":"
+
+# Telegram ограничивает callback_data 64 байтами
+CALLBACK_DATA_MAX_BYTES = 64
+
+# Поиск: короткий запрос передается как есть, длинный - токеном с отдельным
+# префиксом, который не может совпасть с текстом запроса
+SEARCH_PREFIX = "search:"
+SEARCH_TOKEN_PREFIX = "st:"
+
+# Длинные поисковые запросы хранятся локально, в callback уходит короткий токен
+_search_queries: TTLCache = TTLCache(maxsize=10_000, ttl=300)
+
+# Короткие теги действий: полное имя -> тег
+ACTION_TAGS = {
+    "add_track_to_playlist": "atp",
+    "create_playlist_with_track": "cpt",
+}
+_ACTION_NAMES = {tag: action for action, tag in ACTION_TAGS.items()}
+# Готовые префиксы "тег:" для сборки без лишних конкатенаций
+_ACTION_PREFIXES = {action: tag + CALLBACK_SEPARATOR for action, tag in ACTION_TAGS.items()}
+
+# Однобуквенные коды источников
+SOURCE_CODES = {
+    TrackSource.VK_AUDIO.value: "v",
+    TrackSource.YOUTUBE.value: "y",
+    TrackSource.SPOTIFY.value: "s",
+    TrackSource.SOUNDCLOUD.value: "c",
+    TrackSource.DEEZER.value: "d",
+    TrackSource.APPLE_MUSIC.value: "a",
+    TrackSource.LOCAL.value: "l",
+}
+_SOURCE_NAMES = {code: source for source, code in SOURCE_CODES.items()}
+
+
+def callback_prefixes(action: str) -> Tuple[str, str]:
+    """Префиксы действия в новом и старом формате для фильтров"""
+    return _ACTION_PREFIXES[action], action + CALLBACK_SEPARATOR
+
+
+def pack_track_callback(action: str, *fields: str, source: str) -> str:
+    """Собрать callback_data: тег действия, поля и код источника"""
+    return _ACTION_PREFIXES[action] + CALLBACK_SEPARATOR.join(
+        (*fields, SOURCE_CODES.get(source, source))
+    )
+
+
+def unpack_track_callback(data: str, fields_count: int = 1) -> Tuple[str, List[str], str]:
+    """Разобрать callback_data в (действие, поля, источник)
+
+    fields_count - число полей между действием и источником. Последнее поле
+    (ID трека) может содержать разделитель и возвращается целиком.
+    Понимает и старый формат с полными именами действий и источников
+    """
+    tag, rest = data.split(CALLBACK_SEPARATOR, 1)
+    body, _, source = rest.rpartition(CALLBACK_SEPARATOR)
+    fields = body.split(CALLBACK_SEPARATOR, fields_count - 1)
+    return _ACTION_NAMES.get(tag, tag), fields, _SOURCE_NAMES.get(source, source)
+
+
+def build_search_callback_data(query: str) -> str:
+    """callback_data для поиска, укладывающийся в лимит Telegram"""
+    callback_data = SEARCH_PREFIX + query
+    if len(callback_data.encode("utf-8")) <= CALLBACK_DATA_MAX_BYTES:
+        return callback_data
+    
+    token = secrets.token_urlsafe(6)
+    _search_queries[token] = query
+    return SEARCH_TOKEN_PREFIX + token
+
+
+def resolve_search_query(data: str) -> Optional[str]:
+    """Получить поисковый запрос из callback_data (None - токен устарел)"""
+    if data.startswith(SEARCH_TOKEN_PREFIX):
+        return _search_queries.get(data[len(SEARCH_TOKEN_PREFIX):])
+    return data[len(SEARCH_PREFIX):]
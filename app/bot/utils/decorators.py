@@ -0,0 +1,37 @@
+"""
+Декораторы для обработчиков бота
+"""
+import functools
+from typing import Any, Awaitable, Callable, Optional
+
+from aiogram.types import Message, TelegramObject
+
+from app.core.logging import get_logger
+
+
+def safe_handler(
+    error_text: str,
+    reply_markup: Optional[Callable[[], Any]] = None
+):
+    """Перехват ошибок обработчика: логирование и ответ пользователю
+
+    reply_markup - фабрика клавиатуры для сообщения об ошибке (только Message)
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        logger = get_logger(func.__module__)
+
+        @functools.wraps(func)
+        async def wrapper(event: TelegramObject, *args, **kwargs):
+            try:
+                return await func(event, *args, **kwargs)
+            except Exception:
+                logger.exception("Error in handler %s", func.__name__)
+
+                if isinstance(event, Message) and reply_markup:
+                    await event.answer(error_text, reply_markup=reply_markup())
+                else:
+                    await event.answer(error_text)
+
+        return wrapper
+
+    return decorator
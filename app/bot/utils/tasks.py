@@ -0,0 +1,43 @@
+"""
+Фоновые задачи, результат которых не нужен обработчику
+"""
+import asyncio
+from typing import Any, Coroutine, Optional, Set
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Предел одновременно выполняющихся фоновых задач
+MAX_BACKGROUND_TASKS = 10_000
+
+# Ссылки на задачи, чтобы их не собрал сборщик мусора до завершения
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _on_task_done(task: asyncio.Task) -> None:
+    """Удаление завершенной задачи и логирование ее ошибки"""
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(
+            "Background task failed: %s",
+            task.get_name(),
+            exc_info=task.exception()
+        )
+
+
+def fire_and_forget(coro: Coroutine[Any, Any, Any], name: Optional[str] = None) -> bool:
+    """Запустить корутину в фоне, не дожидаясь результата
+
+    При превышении MAX_BACKGROUND_TASKS корутина отбрасывается,
+    чтобы не копить задачи под нагрузкой. Возвращает True, если задача запущена
+    """
+    if len(_background_tasks) >= MAX_BACKGROUND_TASKS:
+        coro.close()
+        logger.warning("Background task dropped: %s", name)
+        return False
+    
+    task = asyncio.create_task(coro, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_on_task_done)
+    return True
@@ -30,6 +30,8 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str = "music_bot"
     DATABASE_URL: Optional[PostgresDsn] = None
+    # DATABASE_URL указывает на PgBouncer в transaction mode
+    USE_PGBOUNCER: bool = False
     
     @validator("DATABASE_URL", pre=True)
     def assemble_db_connection(cls, v: Optional[str], values: dict) -> str:
@@ -101,6 +103,11 @@ class Settings(BaseSettings):
     RATE_LIMIT_FREE_USERS: int = 30  # треков в день
     RATE_LIMIT_PREMIUM_USERS: int = 10000  # треков в день
     SEARCH_RATE_LIMIT: int = 20  # поисков в минуту
+    # Событий в минуту до аутентификации. Только защита от флуда: должно быть
+    # выше суммы лимитов ThrottlingMiddleware для Premium (2 * (30 + 50 + 100))
+    USER_EVENTS_RATE_LIMIT: int = 400
+    FLOOD_LIMIT: int = 5  # сообщений за FLOOD_WINDOW секунд; 0 - без проверки флуда
+    FLOOD_WINDOW: int = 10
     
     # Premium Settings
     PREMIUM_PRICE_1M: int = 150  # Stars за 1 месяц
@@ -140,7 +147,11 @@ class Settings(BaseSettings):
 
 @lru_cache()
 def get_settings() -> Settings:
-    """Получить настройки приложения (с кешированием)"""
+    """Получить настройки приложения (с кешированием)
+
+    Валидация выполняется один раз на процесс. Настройки не кешируются на диск:
+    в них секреты, а значения из переменных окружения не отражаются в mtime .env
+    """
     return Settings()
 
 
@@ -5,7 +5,8 @@ from typing import AsyncGenerator, Optional
 from contextlib import asynccontextmanager
 
 import asyncpg
-from sqlalchemy import MetaData, event
+import orjson
+from sqlalchemy import FetchedValue, MetaData
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     AsyncEngine,
@@ -13,7 +14,8 @@ from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy.sql import text
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql import func, text
 from sqlalchemy.types import DateTime, BigInteger
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime, timezone
@@ -39,6 +41,10 @@ class Base(DeclarativeBase):
         }
     )
     
+    # Значения, вычисленные в БД (updated_at), возвращаются через RETURNING
+    # в том же запросе, а не дозагружаются при обращении
+    __mapper_args__ = {"eager_defaults": True}
+    
     # Общие поля для всех таблиц
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
@@ -53,9 +59,11 @@ class Base(DeclarativeBase):
         comment="Дата создания"
     )
     
+    # now() подставляется в UPDATE, значение вычисляет PostgreSQL
     updated_at: Mapped[Optional[datetime]] = mapped_column(
         DateTime(timezone=True),
-        onupdate=lambda: datetime.now(timezone.utc),
+        onupdate=func.now(),
+        server_onupdate=FetchedValue(),
         comment="Дата последнего обновления"
     )
     
@@ -69,23 +77,48 @@ engine: Optional[AsyncEngine] = None
 async_session_maker: Optional[async_sessionmaker[AsyncSession]] = None
 
 
+def _json_serializer(obj) -> str:
+    """Сериализация JSON колонок через orjson (datetime - в ISO 8601 UTC)"""
+    return orjson.dumps(obj, option=orjson.OPT_UTC_Z | orjson.OPT_NAIVE_UTC).decode()
+
+
 def create_engine() -> AsyncEngine:
-    """Создание асинхронного движка базы данных"""
+    """Создание асинхронного движка базы данных
+
+    За PgBouncer (transaction mode) пул ведет PgBouncer, а prepared statements
+    отключены: соседние транзакции попадают на разные серверные соединения
+    """
+    connect_args = {
+        "server_settings": {
+            "application_name": f"{settings.PROJECT_NAME}",
+            "jit": "off",
+        },
+        "command_timeout": 60,
+    }
+    
+    if settings.USE_PGBOUNCER:
+        connect_args.update(
+            statement_cache_size=0,
+            prepared_statement_cache_size=0,
+            # Уникальные имена, чтобы не конфликтовать с чужими statements на соединении
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid.uuid4()}__",
+        )
+        pool_args = {"poolclass": NullPool}
+    else:
+        pool_args = {
+            "pool_size": 20,
+            "max_overflow": 30,
+            "pool_pre_ping": True,
+            "pool_recycle": 3600,
+        }
+    
     return create_async_engine(
         str(settings.DATABASE_URL),
         echo=settings.DEBUG,
-        pool_size=20,
-        max_overflow=30,
-        pool_pre_ping=True,
-        pool_recycle=3600,
-        json_serializer=lambda obj: obj,
-        connect_args={
-            "server_settings": {
-                "application_name": f"{settings.PROJECT_NAME}",
-                "jit": "off",
-            },
-            "command_timeout": 60,
-        },
+        json_serializer=_json_serializer,
+        json_deserializer=orjson.loads,
+        connect_args=connect_args,
+        **pool_args,
     )
 
 
@@ -143,6 +176,8 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
 class DatabaseManager:
     """Менеджер базы данных для удобной работы"""
     
+    __slots__ = ("engine", "session_maker")
+    
     def __init__(self):
         self.engine = engine
         self.session_maker = async_session_maker
@@ -211,13 +246,6 @@ async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
-# Event listeners для автоматического обновления updated_at
-@event.listens_for(Base, 'before_update', propagate=True)
-def receive_before_update(mapper, connection, target):
-    """Автоматическое обновление поля updated_at"""
-    target.updated_at = datetime.now(timezone.utc)
-
-
 # Функции для работы с транзакциями
 async def execute_in_transaction(func, *args, **kwargs):
     """Выполнение функции в транзакции"""
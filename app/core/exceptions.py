@@ -2,8 +2,10 @@
 """
 Кастомные исключения для приложения
 """
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from asyncpg.exceptions import UniqueViolationError, PostgresError
 
 
 class BaseAppException(Exception):
@@ -24,7 +26,10 @@ class BaseAppException(Exception):
         return f"{self.code}: {self.message}"
     
     def to_dict(self) -> Dict[str, Any]:
-        """Конвертация в словарь для API ответов"""
+        """Конвертация в словарь для API ответов
+
+        Каждый вызов возвращает новый словарь: вызывающий код может его менять
+        """
         return {
             "error": self.code,
             "message": self.message,
@@ -375,6 +380,8 @@ class ExternalServiceError(BaseAppException):
 
 
 # HTTP Exceptions для FastAPI
+# Экземпляры создаются на каждый raise: общий экземпляр накапливал бы
+# __traceback__ и __context__ между запросами и конкурентными задачами
 class HTTPNotFoundException(HTTPException):
     """HTTP 404 исключение"""
     
@@ -439,9 +446,6 @@ class HTTPInternalServerErrorException(HTTPException):
 # Utility functions
 def handle_database_error(error: Exception) -> BaseAppException:
     """Обработка ошибок базы данных"""
-    from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-    from asyncpg.exceptions import UniqueViolationError, PostgresError
-    
     if isinstance(error, IntegrityError):
         return RecordAlreadyExistsError("Record", "constraint", "unknown")
     elif isinstance(error, UniqueViolationError):
@@ -452,40 +456,41 @@ def handle_database_error(error: Exception) -> BaseAppException:
         return DatabaseError(str(error))
 
 
+# Код исключения -> (HTTP статус, описание); строится один раз при импорте
+_ERROR_MAPPING: Dict[str, Tuple[int, str]] = {
+    "RECORD_NOT_FOUND": (status.HTTP_404_NOT_FOUND, "Resource not found"),
+    "USER_NOT_FOUND": (status.HTTP_404_NOT_FOUND, "User not found"),
+    "USER_BANNED": (status.HTTP_403_FORBIDDEN, "User is banned"),
+    "USER_INACTIVE": (status.HTTP_403_FORBIDDEN, "User is inactive"),
+    "DAILY_LIMIT_EXCEEDED": (status.HTTP_429_TOO_MANY_REQUESTS, "Daily limit exceeded"),
+    "RATE_LIMIT_EXCEEDED": (status.HTTP_429_TOO_MANY_REQUESTS, "Rate limit exceeded"),
+    "TRACK_NOT_FOUND": (status.HTTP_404_NOT_FOUND, "Track not found"),
+    "DOWNLOAD_ERROR": (status.HTTP_500_INTERNAL_SERVER_ERROR, "Download failed"),
+    "SERVICE_UNAVAILABLE": (status.HTTP_503_SERVICE_UNAVAILABLE, "Service unavailable"),
+    "PAYMENT_NOT_FOUND": (status.HTTP_404_NOT_FOUND, "Payment not found"),
+    "PAYMENT_FAILED": (status.HTTP_400_BAD_REQUEST, "Payment failed"),
+    "PLAYLIST_NOT_FOUND": (status.HTTP_404_NOT_FOUND, "Playlist not found"),
+    "PLAYLIST_ACCESS_DENIED": (status.HTTP_403_FORBIDDEN, "Access denied to playlist"),
+    "VALIDATION_ERROR": (status.HTTP_422_UNPROCESSABLE_ENTITY, "Validation error"),
+    "CONFIGURATION_ERROR": (status.HTTP_500_INTERNAL_SERVER_ERROR, "Configuration error"),
+}
+
+_DEFAULT_ERROR: Tuple[int, str] = (status.HTTP_500_INTERNAL_SERVER_ERROR, "Internal server error")
+
+
 def exception_to_http(exception: BaseAppException) -> HTTPException:
     """Конвертация кастомного исключения в HTTP исключение"""
     
-    error_mapping = {
-        "RECORD_NOT_FOUND": (status.HTTP_404_NOT_FOUND, "Resource not found"),
-        "USER_NOT_FOUND": (status.HTTP_404_NOT_FOUND, "User not found"),
-        "USER_BANNED": (status.HTTP_403_FORBIDDEN, "User is banned"),
-        "USER_INACTIVE": (status.HTTP_403_FORBIDDEN, "User is inactive"),
-        "DAILY_LIMIT_EXCEEDED": (status.HTTP_429_TOO_MANY_REQUESTS, "Daily limit exceeded"),
-        "RATE_LIMIT_EXCEEDED": (status.HTTP_429_TOO_MANY_REQUESTS, "Rate limit exceeded"),
-        "TRACK_NOT_FOUND": (status.HTTP_404_NOT_FOUND, "Track not found"),
-        "DOWNLOAD_ERROR": (status.HTTP_500_INTERNAL_SERVER_ERROR, "Download failed"),
-        "SERVICE_UNAVAILABLE": (status.HTTP_503_SERVICE_UNAVAILABLE, "Service unavailable"),
-        "PAYMENT_NOT_FOUND": (status.HTTP_404_NOT_FOUND, "Payment not found"),
-        "PAYMENT_FAILED": (status.HTTP_400_BAD_REQUEST, "Payment failed"),
-        "PLAYLIST_NOT_FOUND": (status.HTTP_404_NOT_FOUND, "Playlist not found"),
-        "PLAYLIST_ACCESS_DENIED": (status.HTTP_403_FORBIDDEN, "Access denied to playlist"),
-        "VALIDATION_ERROR": (status.HTTP_422_UNPROCESSABLE_ENTITY, "Validation error"),
-        "CONFIGURATION_ERROR": (status.HTTP_500_INTERNAL_SERVER_ERROR, "Configuration error"),
-    }
-    
-    status_code, default_detail = error_mapping.get(
-        exception.code,
-        (status.HTTP_500_INTERNAL_SERVER_ERROR, "Internal server error")
-    )
+    status_code, default_detail = _ERROR_MAPPING.get(exception.code, _DEFAULT_ERROR)
     
     detail = exception.to_dict() if hasattr(exception, 'to_dict') else str(exception)
     
-    headers = {}
+    headers = None
     if exception.code == "RATE_LIMIT_EXCEEDED" and "retry_after" in exception.details:
-        headers["Retry-After"] = str(exception.details["retry_after"])
+        headers = {"Retry-After": str(exception.details["retry_after"])}
     
     return HTTPException(
         status_code=status_code,
         detail=detail,
-        headers=headers if headers else None
-    )
\ No newline at end of file
+        headers=headers
+    )
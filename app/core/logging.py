@@ -1,17 +1,54 @@
 """
 Настройка структурированного логирования с помощью structlog
 """
+import asyncio
+import functools
 import logging
 import logging.config
 import sys
+import time
+from contextvars import ContextVar
 from pathlib import Path
 from typing import Any, Dict
 
+import orjson
 import structlog
 from structlog.types import FilteringBoundLogger
 
 from app.core.config import settings
 
+# Контекст текущего запроса/апдейта; подмешивается в каждую запись лога
+_request_id_var: ContextVar[str] = ContextVar("request_id", default="")
+_user_id_var: ContextVar[int] = ContextVar("user_id", default=0)
+
+# Минимальный уровень логов structlog, вычисляется один раз из настроек
+LOG_LEVEL: int = getattr(logging, settings.LOG_LEVEL.upper())
+
+
+# Стандартные атрибуты LogRecord; все остальное пришло через extra=
+_RECORD_ATTRS = frozenset(
+    logging.LogRecord("", 0, "", 0, "", None, None).__dict__
+) | {"message", "asctime"}
+
+
+class OrjsonFormatter(logging.Formatter):
+    """JSON-форматтер стандартного logging на orjson"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "asctime": self.formatTime(record),
+            "name": record.name,
+            "levelname": record.levelname,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        
+        return orjson.dumps(payload, default=str).decode()
+
 
 def setup_logging() -> None:
     """Настройка системы логирования"""
@@ -19,29 +56,47 @@ def setup_logging() -> None:
     # Создание директории для логов
     settings.LOGS_DIR.mkdir(exist_ok=True)
     
-    # Конфигурация structlog
-    structlog.configure(
-        processors=[
-            structlog.contextvars.merge_contextvars,
-            structlog.processors.add_log_level,
-            structlog.processors.add_logger_name,
-            structlog.processors.TimeStamper(fmt="iso"),
-            structlog.dev.set_exc_info,
+    json_logs = settings.LOG_FORMAT == "json"
+    
+    processors = [
+        structlog.contextvars.merge_contextvars,
+        structlog.processors.add_log_level,
+        structlog.processors.add_logger_name,
+        structlog.processors.TimeStamper(fmt="iso"),
+        structlog.dev.set_exc_info,
+        _add_context,
+    ]
+    
+    # Место вызова требует обхода стека на каждую запись - только для отладки
+    if settings.LOG_LEVEL.upper() == "DEBUG":
+        processors.append(
             structlog.processors.CallsiteParameterAdder(
                 parameters=[
                     structlog.processors.CallsiteParameter.FUNC_NAME,
                     structlog.processors.CallsiteParameter.LINENO,
                 ]
-            ),
-            _add_request_id,
-            _add_user_id,
-            structlog.processors.JSONRenderer() if settings.LOG_FORMAT == "json" 
-            else structlog.dev.ConsoleRenderer(colors=True),
-        ],
+            )
+        )
+    
+    if json_logs:
+        # exc_info -> текст traceback в поле "exception"; ConsoleRenderer
+        # форматирует исключения сам
+        processors.append(structlog.processors.format_exc_info)
+        processors.append(structlog.processors.JSONRenderer(serializer=orjson.dumps))
+    else:
+        processors.append(structlog.dev.ConsoleRenderer(colors=True))
+    
+    # Конфигурация structlog
+    structlog.configure(
+        processors=processors,
         wrapper_class=structlog.make_filtering_bound_logger(
-            getattr(logging, settings.LOG_LEVEL.upper())
+            LOG_LEVEL
+        ),
+        # orjson отдает bytes - пишем их в поток без декодирования
+        logger_factory=(
+            structlog.BytesLoggerFactory() if json_logs
+            else structlog.PrintLoggerFactory()
         ),
-        logger_factory=structlog.PrintLoggerFactory(),
         cache_logger_on_first_use=True,
     )
     
@@ -51,8 +106,7 @@ def setup_logging() -> None:
         "disable_existing_loggers": False,
         "formatters": {
             "json": {
-                "()": "pythonjsonlogger.jsonlogger.JsonFormatter",
-                "format": "%(asctime)s %(name)s %(levelname)s %(message)s",
+                "()": OrjsonFormatter,
             },
             "standard": {
                 "format": "%(asctime)s [%(levelname)s] %(name)s: %(message)s",
@@ -62,13 +116,13 @@ def setup_logging() -> None:
             "console": {
                 "class": "logging.StreamHandler",
                 "level": settings.LOG_LEVEL,
-                "formatter": "json" if settings.LOG_FORMAT == "json" else "standard",
+                "formatter": "json" if json_logs else "standard",
                 "stream": sys.stdout,
             },
             "file": {
                 "class": "logging.handlers.RotatingFileHandler",
                 "level": settings.LOG_LEVEL,
-                "formatter": "json" if settings.LOG_FORMAT == "json" else "standard",
+                "formatter": "json" if json_logs else "standard",
                 "filename": settings.LOGS_DIR / "app.log",
                 "maxBytes": 10485760,  # 10MB
                 "backupCount": 5,
@@ -77,7 +131,7 @@ def setup_logging() -> None:
             "error_file": {
                 "class": "logging.handlers.RotatingFileHandler",
                 "level": "ERROR",
-                "formatter": "json" if settings.LOG_FORMAT == "json" else "standard",
+                "formatter": "json" if json_logs else "standard",
                 "filename": settings.LOGS_DIR / "error.log",
                 "maxBytes": 10485760,  # 10MB
                 "backupCount": 5,
@@ -111,32 +165,34 @@ def setup_logging() -> None:
     logging.config.dictConfig(logging_config)
 
 
-def _add_request_id(logger: Any, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
-    """Добавление request_id в лог"""
-    from contextvars import ContextVar
-    
-    request_id_var: ContextVar[str] = ContextVar('request_id', default='')
-    request_id = request_id_var.get()
-    
-    if request_id:
-        event_dict["request_id"] = request_id
-    
-    return event_dict
+def set_request_id(request_id: str) -> None:
+    """Установить request_id для текущего контекста"""
+    _request_id_var.set(request_id)
 
 
-def _add_user_id(logger: Any, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
-    """Добавление user_id в лог"""
-    from contextvars import ContextVar
-    
-    user_id_var: ContextVar[int] = ContextVar('user_id', default=0)
-    user_id = user_id_var.get()
+def set_user_id(user_id: int) -> None:
+    """Установить user_id для текущего контекста"""
+    _user_id_var.set(user_id)
+
+
+def _add_context(logger: Any, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """Добавление request_id и user_id в лог"""
+    request_id = _request_id_var.get()
+    user_id = _user_id_var.get()
     
+    if request_id:
+        event_dict["request_id"] = request_id
     if user_id:
         event_dict["user_id"] = user_id
     
     return event_dict
 
 
+def is_enabled_for(level: int) -> bool:
+    """Будут ли записаны логи уровня level"""
+    return level >= LOG_LEVEL
+
+
 def get_logger(name: str) -> FilteringBoundLogger:
     """Получение логгера с именем"""
     return structlog.get_logger(name)
@@ -343,78 +399,69 @@ security_logger = SecurityLogger()
 # Декораторы для автоматического логирования
 def log_function_call(logger_instance=None):
     """Декоратор для логирования вызовов функций"""
-    import functools
-    import time
     
     def decorator(func):
-        @functools.wraps(func)
-        async def async_wrapper(*args, **kwargs):
-            logger = logger_instance or get_logger(func.__module__)
-            start_time = time.time()
-            
-            try:
-                result = await func(*args, **kwargs)
-                duration = time.time() - start_time
+        logger = logger_instance or get_logger(func.__module__)
+        name = func.__name__
+        done_msg = f"Function {name} completed"
+        failed_msg = f"Function {name} failed"
+        
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                start_time = time.perf_counter_ns()
+                
+                try:
+                    result = await func(*args, **kwargs)
+                    
+                except Exception as e:
+                    logger.error(
+                        failed_msg,
+                        function=name,
+                        duration_ms=(time.perf_counter_ns() - start_time) // 1_000_000,
+                        error=str(e),
+                        error_type=type(e).__name__
+                    )
+                    raise
                 
                 logger.debug(
-                    f"Function {func.__name__} completed",
-                    function=func.__name__,
-                    duration_ms=round(duration * 1000, 2),
+                    done_msg,
+                    function=name,
+                    duration_ms=(time.perf_counter_ns() - start_time) // 1_000_000,
                     args_count=len(args),
                     kwargs_count=len(kwargs)
                 )
-                
                 return result
-                
-            except Exception as e:
-                duration = time.time() - start_time
-                
-                logger.error(
-                    f"Function {func.__name__} failed",
-                    function=func.__name__,
-                    duration_ms=round(duration * 1000, 2),
-                    error=str(e),
-                    error_type=type(e).__name__
-                )
-                raise
+            
+            return wrapper
         
         @functools.wraps(func)
-        def sync_wrapper(*args, **kwargs):
-            logger = logger_instance or get_logger(func.__module__)
-            start_time = time.time()
+        def wrapper(*args, **kwargs):
+            start_time = time.perf_counter_ns()
             
             try:
                 result = func(*args, **kwargs)
-                duration = time.time() - start_time
-                
-                logger.debug(
-                    f"Function {func.__name__} completed",
-                    function=func.__name__,
-                    duration_ms=round(duration * 1000, 2),
-                    args_count=len(args),
-                    kwargs_count=len(kwargs)
-                )
-                
-                return result
                 
             except Exception as e:
-                duration = time.time() - start_time
-                
                 logger.error(
-                    f"Function {func.__name__} failed",
-                    function=func.__name__,
-                    duration_ms=round(duration * 1000, 2),
+                    failed_msg,
+                    function=name,
+                    duration_ms=(time.perf_counter_ns() - start_time) // 1_000_000,
                     error=str(e),
                     error_type=type(e).__name__
                 )
                 raise
+            
+            logger.debug(
+                done_msg,
+                function=name,
+                duration_ms=(time.perf_counter_ns() - start_time) // 1_000_000,
+                args_count=len(args),
+                kwargs_count=len(kwargs)
+            )
+            return result
         
-        # Определяем, асинхронная ли функция
-        import asyncio
-        if asyncio.iscoroutinefunction(func):
-            return async_wrapper
-        else:
-            return sync_wrapper
+        return wrapper
     
     return decorator
 
@@ -0,0 +1,10 @@
+"""
+Метрики Prometheus для бота
+"""
+from prometheus_client import Counter
+
+# Обновления, прошедшие через цепочку middleware
+BOT_UPDATES = Counter("bot_updates_total", "Total number of processed bot updates")
+
+# Обновления, обработка которых завершилась ошибкой
+BOT_ERRORS = Counter("bot_errors_total", "Total number of failed bot updates")
@@ -5,7 +5,7 @@ from typing import Any, Dict, List, Optional, Type, TypeVar
 from datetime import datetime, timezone
 import uuid
 
-from sqlalchemy import String, DateTime, Boolean, Integer, BigInteger, Text
+from sqlalchemy import String, DateTime, Boolean, Integer, BigInteger, Text, FetchedValue
 from sqlalchemy.orm import Mapped, mapped_column, DeclarativeBase
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -29,7 +29,8 @@ class TimestampMixin:
     
     updated_at: Mapped[Optional[datetime]] = mapped_column(
         DateTime(timezone=True),
-        onupdate=lambda: datetime.now(timezone.utc),
+        onupdate=func.now(),
+        server_onupdate=FetchedValue(),
         comment="Дата и время последнего обновления записи"
     )
 
@@ -72,6 +72,7 @@ class UserStats(BaseModel):
     favorite_tracks_count: int
     playlists_count: int
     days_since_registration: int
+    is_premium: bool = False
     premium_days_left: Optional[int]
     most_played_genre: Optional[str]
     listening_time_hours: float
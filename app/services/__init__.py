@@ -2,6 +2,7 @@
 Инициализация всех сервисов приложения
 """
 import asyncio
+from functools import cache
 from typing import Dict, Any
 from contextlib import asynccontextmanager
 
@@ -235,32 +236,40 @@ async def service_lifespan():
         await service_manager.shutdown_all()
 
 
-# Функции для быстрого доступа к сервисам
+# Функции для быстрого доступа к сервисам.
+# Менеджер регистрирует те же глобальные экземпляры, что используются как
+# fallback, поэтому результат не меняется после инициализации и кешируется.
+@cache
 def get_user_service():
     """Получить сервис пользователей"""
     return service_manager.get_service('user_service') or user_service
 
 
+@cache
 def get_playlist_service():
     """Получить сервис плейлистов"""
     return service_manager.get_service('playlist_service') or playlist_service
 
 
+@cache
 def get_search_service():
     """Получить сервис поиска"""
     return service_manager.get_service('search_service') or search_service
 
 
+@cache
 def get_cache_service():
     """Получить сервис кеширования"""
     return service_manager.get_service('cache') or cache_service
 
 
+@cache
 def get_payment_service():
     """Получить сервис платежей"""
     return service_manager.get_service('payment_service') or payment_service
 
 
+@cache
 def get_analytics_service():
     """Получить сервис аналитики"""
     return service_manager.get_service('analytics_service') or analytics_service
@@ -309,13 +318,4 @@ __all__ = [
     'payment_service',
     'analytics_service',
     'cache_service'
-]_search_service',
-    'get_cache_service',
-    'get_music_aggregator',
-    'wait_for_services',
-    'init_services',
-    'user_service',
-    'playlist_service',
-    'search_service',
-    'cache_service'
-]
\ No newline at end of file
+]
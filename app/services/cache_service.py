@@ -7,11 +7,18 @@ import hashlib
 from typing import Any, Optional, Dict, List, Union
 from datetime import datetime, timezone, timedelta
 import aioredis
+import orjson
 from redis.exceptions import RedisError
 
 from app.core.config import settings
 from app.core.logging import get_logger
 
+# Максимум соединений в общем пуле Redis для кеша
+REDIS_MAX_CONNECTIONS = 50
+
+# Общий клиент Redis для всех экземпляров CacheService
+_shared_redis: Optional[aioredis.Redis] = None
+
 
 class CacheService:
     """Сервис для многоуровневого кеширования"""
@@ -33,34 +40,52 @@ class CacheService:
             'trending': 1800,  # 30 минут
             'recommendations': 3600,  # 1 час
             'health_check': 60,  # 1 минута
+            'keyboard': 60,  # 1 минута
+            'user_bundle': 30,  # 30 секунд
         }
     
     async def init_redis(self):
-        """Инициализация Redis подключения"""
-        try:
-            self.redis = aioredis.from_url(
-                settings.REDIS_URL,
-                encoding="utf-8",
-                decode_responses=True,
-                retry_on_timeout=True,
-                socket_connect_timeout=5,
-                socket_timeout=5
-            )
-            
-            # Проверяем подключение
-            await self.redis.ping()
-            self.logger.info("Redis connection established")
-            
-        except Exception as e:
-            self.logger.error(f"Failed to connect to Redis: {e}")
-            self.redis = None
+        """Инициализация Redis подключения
+
+        Все экземпляры кеша используют один клиент и один пул соединений
+        """
+        global _shared_redis
+        
+        if _shared_redis is None:
+            try:
+                client = aioredis.from_url(
+                    settings.REDIS_URL,
+                    encoding="utf-8",
+                    decode_responses=True,
+                    retry_on_timeout=True,
+                    socket_connect_timeout=5,
+                    socket_timeout=5,
+                    max_connections=REDIS_MAX_CONNECTIONS
+                )
+                
+                # Проверяем подключение
+                await client.ping()
+                _shared_redis = client
+                self.logger.info("Redis connection established")
+                
+            except Exception as e:
+                self.logger.error(f"Failed to connect to Redis: {e}")
+                self.redis = None
+                return
+        
+        self.redis = _shared_redis
     
     async def close_redis(self):
         """Закрытие Redis подключения"""
+        global _shared_redis
+        
         if self.redis:
-            await self.redis.close()
+            # Общий клиент закрывает первый из экземпляров, остальные отпускают ссылку
+            if self.redis is _shared_redis:
+                await self.redis.close()
+                _shared_redis = None
+                self.logger.info("Redis connection closed")
             self.redis = None
-            self.logger.info("Redis connection closed")
     
     def _make_cache_key(self, prefix: str, key: str) -> str:
         """Создать ключ для кеша"""
@@ -149,9 +174,9 @@ class CacheService:
                     redis_value = await self.redis.get(cache_key)
                     if redis_value:
                         deserialized = self._deserialize_value(redis_value)
-                        # Сохраняем в локальный кеш
+                        # Сохраняем в локальный кеш не дольше TTL типа данных
                         if deserialized is not None:
-                            self._set_local_cache(cache_key, deserialized, 300)  # 5 мин в локальном
+                            self._set_local_cache(cache_key, deserialized, self._local_ttl(cache_type))
                         return deserialized
                 except RedisError as e:
                     self.logger.warning(f"Redis get failed: {e}")
@@ -282,7 +307,7 @@ class CacheService:
                             if deserialized is not None:
                                 result[original_key] = deserialized
                                 # Сохраняем в локальный кеш
-                                self._set_local_cache(cache_key, deserialized, 300)
+                                self._set_local_cache(cache_key, deserialized, self._local_ttl(cache_type))
                 except RedisError as e:
                     self.logger.warning(f"Redis mget failed: {e}")
             
@@ -405,6 +430,14 @@ class CacheService:
             self.logger.error(f"Failed to get cache stats: {e}")
             return {"error": str(e)}
     
+    def _local_ttl(self, cache_type: str) -> int:
+        """TTL локальной копии значения из Redis
+
+        Не больше 5 минут и не больше TTL самого типа данных: короткоживущие
+        записи (например, user_bundle) не должны переживать свой срок в L1
+        """
+        return min(300, self.ttl_settings.get(cache_type, 300))
+    
     def _set_local_cache(self, key: str, value: Any, ttl: int):
         """Установить значение в локальный кеш"""
         # Очищаем если превышен размер
@@ -540,6 +573,54 @@ class UserCacheService(CacheService):
         cache_key = f"subscription:{telegram_id}"
         return await self.get(cache_key, cache_type="user_data")
     
+    async def cache_user_bundle(
+        self,
+        telegram_id: int,
+        bundle: Dict[str, Any]
+    ) -> bool:
+        """Кешировать данные пользователя для middleware
+
+        bundle - снимок из простых значений (без ORM объектов), хранится
+        Redis-хешем без локального кеша: инвалидация (бан, скачивание)
+        сразу видна всем процессам
+        """
+        if self.redis is None:
+            return False
+        
+        cache_key = self._make_cache_key("user_bundle", f"bundle:{telegram_id}")
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hset(cache_key, mapping={
+                    field: orjson.dumps(value) for field, value in bundle.items()
+                })
+                pipe.expire(cache_key, self.ttl_settings["user_bundle"])
+                await pipe.execute()
+            return True
+        except RedisError as e:
+            self.logger.warning(f"Redis bundle set failed: {e}")
+            return False
+    
+    async def get_cached_user_bundle(self, telegram_id: int) -> Optional[Dict[str, Any]]:
+        """Получить кешированные данные пользователя для middleware (один HGETALL)"""
+        if self.redis is None:
+            return None
+        
+        cache_key = self._make_cache_key("user_bundle", f"bundle:{telegram_id}")
+        try:
+            fields = await self.redis.hgetall(cache_key)
+        except RedisError as e:
+            self.logger.warning(f"Redis bundle get failed: {e}")
+            return None
+        
+        if not fields:
+            return None
+        return {field: orjson.loads(value) for field, value in fields.items()}
+    
+    async def invalidate_user_bundle(self, telegram_id: int) -> bool:
+        """Инвалидировать кешированные данные пользователя для middleware"""
+        cache_key = f"bundle:{telegram_id}"
+        return await self.delete(cache_key, cache_type="user_bundle")
+    
     async def increment_user_downloads(self, telegram_id: int) -> int:
         """Увеличить счетчик скачиваний пользователя"""
         today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
@@ -567,6 +648,7 @@ class UserCacheService(CacheService):
         await self.clear_pattern(f"*{telegram_id}*", "user_data")
         await self.clear_pattern(f"*{telegram_id}*", "user_limits")
         await self.clear_pattern(f"*{telegram_id}*", "counter")
+        await self.clear_pattern(f"*{telegram_id}*", "user_bundle")
         return True
 
 
@@ -1,8 +1,10 @@
 """
 Сервис для работы с пользователями
 """
+import asyncio
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timezone, timedelta
+from sqlalchemy import bindparam, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
@@ -10,17 +12,23 @@ from sqlalchemy.orm import selectinload
 from app.core.database import get_session
 from app.core.logging import get_logger
 from app.core.config import settings
+from app.services.cache_service import user_cache
 from app.models.user import User, UserSubscription, SubscriptionType
 from app.models.track import Track, TrackPlay
 from app.schemas.user import UserCreate, UserUpdate, UserResponse, UserStats
 from app.schemas.payment import SubscriptionCreate
 
+# Период записи накопленных last_seen в БД (секунды)
+LAST_SEEN_FLUSH_INTERVAL = 2.0
+
 
 class UserService:
     """Сервис для управления пользователями"""
     
     def __init__(self):
         self.logger = get_logger(self.__class__.__name__)
+        # telegram_id -> время последней активности, ожидающее записи в БД
+        self._last_seen_buffer: Dict[int, datetime] = {}
     
     async def get_or_create_user(
         self,
@@ -30,7 +38,10 @@ class UserService:
         last_name: Optional[str] = None,
         language_code: Optional[str] = None
     ) -> User:
-        """Получить или создать пользователя"""
+        """Получить или создать пользователя
+
+        Premium статус доступен через user.is_premium без отдельного запроса
+        """
         async with get_session() as session:
             # Ищем существующего пользователя
             query = select(User).where(User.telegram_id == telegram_id)
@@ -129,6 +140,48 @@ class UserService:
                 user.last_seen_at = datetime.now(timezone.utc)
                 await session.commit()
     
+    def mark_seen(self, telegram_id: int) -> None:
+        """Отметить активность пользователя без обращения к БД
+
+        Время записывается в БД пачкой при следующем flush_last_seen
+        """
+        self._last_seen_buffer[telegram_id] = datetime.now(timezone.utc)
+    
+    async def flush_last_seen(self) -> int:
+        """Записать накопленные last_seen одним UPDATE"""
+        if not self._last_seen_buffer:
+            return 0
+        
+        pending, self._last_seen_buffer = self._last_seen_buffer, {}
+        users = User.__table__
+        query = (
+            update(users)
+            .where(users.c.telegram_id == bindparam("tg_id"))
+            .values(last_seen_at=bindparam("seen_at"))
+        )
+        
+        try:
+            async with get_session() as session:
+                await session.execute(
+                    query,
+                    [{"tg_id": tg_id, "seen_at": seen_at} for tg_id, seen_at in pending.items()]
+                )
+                await session.commit()
+        except Exception as e:
+            self.logger.error(f"Failed to flush last_seen: {e}")
+            # Возвращаем в буфер то, что не было обновлено новыми событиями
+            for tg_id, seen_at in pending.items():
+                self._last_seen_buffer.setdefault(tg_id, seen_at)
+            return 0
+        
+        return len(pending)
+    
+    async def run_last_seen_flusher(self, interval: float = LAST_SEEN_FLUSH_INTERVAL) -> None:
+        """Фоновая задача периодической записи last_seen"""
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush_last_seen()
+    
     async def is_premium_user(self, telegram_id: int) -> bool:
         """Проверить является ли пользователь Premium"""
         async with get_session() as session:
@@ -204,6 +257,8 @@ class UserService:
             await session.commit()
             await session.refresh(subscription)
             
+            await user_cache.invalidate_user_bundle(telegram_id)
+            
             self.logger.info(f"Created subscription for user {telegram_id}")
             return subscription
     
@@ -218,7 +273,9 @@ class UserService:
                     playlists_created=0,
                     total_listening_time=0,
                     favorite_genres=[],
-                    join_date=datetime.now(timezone.utc)
+                    join_date=datetime.now(timezone.utc),
+                    is_premium=False,
+                    premium_days_left=None
                 )
             
             # Количество скачанных треков
@@ -258,7 +315,9 @@ class UserService:
                 playlists_created=len(user.playlists) if user.playlists else 0,
                 total_listening_time=total_listening_time,
                 favorite_genres=[genre for genre, _ in favorite_genres],
-                join_date=user.created_at
+                join_date=user.created_at,
+                is_premium=user.is_premium,
+                premium_days_left=user.days_until_expiry if user.is_premium else None
             )
     
     async def check_daily_limits(self, telegram_id: int) -> Dict[str, Any]:
@@ -322,6 +381,7 @@ class UserService:
             user.updated_at = datetime.now(timezone.utc)
             
             await session.commit()
+            await user_cache.invalidate_user_bundle(telegram_id)
             
             self.logger.warning(f"Banned user {telegram_id}, reason: {reason}")
             return True
@@ -339,6 +399,7 @@ class UserService:
             user.updated_at = datetime.now(timezone.utc)
             
             await session.commit()
+            await user_cache.invalidate_user_bundle(telegram_id)
             
             self.logger.info(f"Unbanned user {telegram_id}")
             return True